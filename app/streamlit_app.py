@@ -27,7 +27,8 @@ st.set_page_config(
 # ------------------------------------------------------------------------
 # INTERNAL IMPORTS (must be AFTER sys.path + AFTER set_page_config)
 # ------------------------------------------------------------------------
-from rag_pipeline.config import paths, retrieval_cfg, models
+from rag_pipeline.config import paths, retrieval_cfg, models, deadline_cfg
+from rag_pipeline.deadline import Deadline
 from rag_pipeline.retrieval import retrieve_uav_docs
 from rag_pipeline.llm_inference import generate_answer
 
@@ -57,6 +58,7 @@ with st.sidebar:
     telemetry_weight = 1.0 - manual_weight
 
     temperature = st.slider("LLM temperature", 0.0, 1.0, 0.2, 0.05)
+    time_budget = st.slider("Time budget (s)", 5, 180, int(deadline_cfg.request_budget_s), 5)
 
     st.markdown(f"**Embedding model:** `{models.embedding_model_name}`")
     st.markdown(f"**Ollama model:** `{models.ollama_model}`")
@@ -80,8 +82,17 @@ if st.button("Diagnose", type="primary") and query.strip():
     retrieval_cfg.manual_weight = manual_weight
     retrieval_cfg.log_weight = telemetry_weight
 
+    # one budget for the whole request: retrieval + generation
+    deadline = Deadline(time_budget)
+
     with st.spinner("Retrieving relevant manual sections and telemetry segments..."):
-        retrieved = retrieve_uav_docs(query)
+        retrieved = retrieve_uav_docs(query, deadline=deadline)
+
+    if retrieved.degraded:
+        st.warning(
+            "Partial results: skipped " + ", ".join(retrieved.skipped)
+            + " to stay within the time budget."
+        )
 
     # -----------------------------
     # CONTEXT PANEL
@@ -116,7 +127,7 @@ if st.button("Diagnose", type="primary") and query.strip():
             st.info("No context available. Try a different query or rebuild your index.")
         else:
             with st.spinner("Calling local LLM via Ollama..."):
-                answer = generate_answer(query, retrieved, temperature=temperature)
+                answer = generate_answer(query, retrieved, temperature=temperature, deadline=deadline)
             st.markdown(answer)
 
         # Debug metadata summary
@@ -0,0 +1,184 @@
+"""
+Offline bulk diagnosis over a JSONL file of queries.
+
+Input  (one JSON object or string per line; "aircraft" is optional, one id
+or a list, and limits telemetry retrieval to those aircraft's shards):
+    {"id": "AC-12_0001", "query": "ESC temp spikes during climb", "aircraft": "AC-12"}
+Output (one JSON object per line, appended as each query finishes):
+    {"id": ..., "query": ..., "answer": ..., "sources": [...], "elapsed_s": ...}
+
+Queries are read lazily, retrieved in batches (one embedding pass and one
+multi-vector query per collection), and answered by a bounded pool of
+generation threads. Output order follows completion order; ids already
+present in the output file are skipped, so an interrupted run can resume.
+Queries that fail (including an Ollama error answer) are not written, so
+the resumed run retries them.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set
+
+from .retrieval import RetrievedDoc, retrieve_uav_docs_batch
+from .llm_inference import OLLAMA_ERROR, generate_answer
+
+
+def _read_done_ids(output_path: Path) -> Set[str]:
+    """
+    Ids already written by a previous run. A truncated last line (crash
+    mid-write) is ignored, so that query is simply redone.
+    """
+    done: Set[str] = set()
+    if not output_path.exists():
+        return done
+
+    with output_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    return done
+
+
+def _iter_queries(input_path: Path, skip_ids: Set[str]) -> Iterator[Dict[str, Any]]:
+    with input_path.open("r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[WARN] Skipping malformed input line {line_no}: {e}")
+                continue
+
+            if isinstance(item, str):
+                item = {"query": item}
+            if not isinstance(item, dict):
+                print(f"[WARN] Skipping input line {line_no}: expected an object or a string, "
+                      f"got {type(item).__name__}")
+                continue
+            if not isinstance(item.get("query"), str) or not item["query"].strip():
+                print(f"[WARN] Skipping input line {line_no}: missing or non-string 'query'")
+                continue
+
+            aircraft = item.get("aircraft")
+            if isinstance(aircraft, list):
+                item["aircraft"] = [str(a) for a in aircraft if a not in (None, "")] or None
+            elif aircraft is not None and not isinstance(aircraft, str):
+                item["aircraft"] = str(aircraft)
+
+            item["id"] = str(item.get("id", line_no))
+            if item["id"] in skip_ids:
+                continue
+            yield item
+
+
+def _iter_batches(items: Iterator[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _diagnose(item: Dict[str, Any], docs: List[RetrievedDoc], temperature: float, t0: float) -> Dict[str, Any]:
+    answer = generate_answer(item["query"], docs, temperature=temperature)
+    if answer == OLLAMA_ERROR:
+        raise RuntimeError(f"no answer from Ollama for id {item['id']}")
+    return {
+        **item,
+        "answer": answer,
+        "sources": [
+            {
+                "source": d.metadata.get("source", ""),
+                "timestamp": d.metadata.get("timestamp", ""),
+                "source_type": d.source_type,
+                "score": round(d.score, 4),
+            }
+            for d in docs
+        ],
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+def run_bulk_diagnosis(
+    input_path: Path,
+    output_path: Path,
+    batch_size: int = 32,
+    concurrency: int = 4,
+    temperature: float = 0.2,
+) -> Dict[str, Any]:
+    """
+    Streams queries from input_path through batched retrieval and
+    `concurrency` parallel generations, appending results to output_path.
+    """
+    done_ids = _read_done_ids(output_path)
+    if done_ids:
+        print(f"[INFO] Resuming: {len(done_ids)} queries already in {output_path.name}")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    failed = 0
+    t_start = time.perf_counter()
+
+    def _write(finished, out_f):
+        nonlocal written, failed
+        for fut in finished:
+            try:
+                record = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"[ERROR] Diagnosis failed: {e}")
+                continue
+            out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            written += 1
+        out_f.flush()
+
+    with output_path.open("a", encoding="utf-8") as out_f, \
+            ThreadPoolExecutor(max_workers=concurrency) as pool:
+
+        pending = set()
+        queries = _iter_queries(input_path, done_ids)
+
+        for batch in _iter_batches(queries, batch_size):
+            t0 = time.perf_counter()
+
+            # items may carry an "aircraft" scope (one id or a list); route
+            # each group to its shards
+            by_aircraft: Dict[Any, List[Dict[str, Any]]] = {}
+            for item in batch:
+                scope = item.get("aircraft")
+                key = tuple(scope) if isinstance(scope, list) else scope
+                by_aircraft.setdefault(key, []).append(item)
+
+            for aircraft, group in by_aircraft.items():
+                docs_batch = retrieve_uav_docs_batch(
+                    [item["query"] for item in group],
+                    aircraft=list(aircraft) if isinstance(aircraft, tuple) else aircraft,
+                )
+                for item, docs in zip(group, docs_batch):
+                    pending.add(pool.submit(_diagnose, item, docs, temperature, t0))
+
+            # keep retrieval at most ~one batch ahead of generation
+            while len(pending) > max(concurrency, batch_size):
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _write(finished, out_f)
+
+            print(f"[INFO] Diagnosed {written} queries "
+                  f"({written / (time.perf_counter() - t_start):.2f} q/s)")
+
+        finished, _ = wait(pending)
+        _write(finished, out_f)
+
+    elapsed = time.perf_counter() - t_start
+    print(f"[SUCCESS] Wrote {written} diagnoses to {output_path} in {elapsed:.1f}s "
+          f"({failed} failed, {len(done_ids)} skipped from previous runs)")
+
+    return {"written": written, "failed": failed, "skipped": len(done_ids), "elapsed_s": elapsed}
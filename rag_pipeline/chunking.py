@@ -26,6 +26,18 @@ def _extract_raw_text(doc: Any) -> str:
     return str(doc)
 
 
+def _chunk_metadata(doc: Any) -> Dict[str, Any]:
+    """
+    Chunks inherit the document's metadata (source, timestamp, aircraft, ...).
+    """
+    if not isinstance(doc, dict):
+        return {"source": "string_input"}
+
+    meta = dict(doc.get("metadata") or {})
+    meta.setdefault("source", doc.get("source", "unknown"))
+    return meta
+
+
 def chunk_text(docs: List[Any]) -> List[Dict[str, Any]]:
     """
     Break input documents into overlapping chunks.
@@ -54,9 +66,7 @@ def chunk_text(docs: List[Any]) -> List[Dict[str, Any]]:
             if chunk:
                 chunks.append({
                     "text": chunk,
-                    "metadata": {
-                        "source": doc.get("source", "unknown") if isinstance(doc, dict) else "string_input"
-                    }
+                    "metadata": _chunk_metadata(doc)
                 })
 
             start += chunk_size - overlap
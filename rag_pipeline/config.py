@@ -1,5 +1,6 @@
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Dict
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 
@@ -10,11 +11,18 @@ class Paths:
     logs_dir: Path = data_dir / "logs"
     ground_truth_dir: Path = data_dir / "ground_truth"
     vector_db_dir: Path = BASE_DIR / "chroma_db"
+    alias_file: Path = vector_db_dir / "aliases.json"
+    shard_registry_file: Path = vector_db_dir / "shards.json"
+    tail_state_file: Path = vector_db_dir / "tail_state.json"
+    build_offsets_file: Path = vector_db_dir / "build_offsets.json"
+    telemetry_store_dir: Path = BASE_DIR / "telemetry_store"
+    index_bundle: Path = BASE_DIR / "index.aerobundle"
 
 @dataclass
 class Models:
     embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
     ollama_model: str = "tinyllama"   # or "mistral" if your PC can handle it
+    ollama_url: str = "http://localhost:11434"
 
 @dataclass
 class RetrievalConfig:
@@ -23,7 +31,64 @@ class RetrievalConfig:
     top_k: int = 6
     manual_weight: float = 0.6
     log_weight: float = 0.4
+    max_numeric_docs: int = 3   # telemetry-store events added for threshold questions
+
+@dataclass
+class IngestionConfig:
+    workers: int = 1                      # 1 = serial, 0 = one per CPU core
+    shard_bytes: int = 32 * 1024 * 1024   # byte-range shard size for large CSVs
+
+@dataclass
+class VectorStoreConfig:
+    keep_versions: int = 1   # previous builds kept per collection after a swap
+    serve_from_bundle: bool = False   # answer queries from paths.index_bundle (mmap) instead of Chroma
+
+@dataclass
+class TailConfig:
+    poll_interval: float = 1.0             # seconds between scans of logs_dir
+    batch_size: int = 64                   # rows per embed + upsert
+    max_read_bytes: int = 4 * 1024 * 1024  # per file per poll, bounds catch-up work
+
+@dataclass
+class EmbeddingConfig:
+    workers: int = 1         # build-time embedding processes (0 = one per CPU core)
+    torch_threads: int = 0   # torch threads per worker (0 = cores // workers)
+    batch_size: int = 64     # texts per worker batch
+
+@dataclass
+class HnswConfig:
+    # Chroma's defaults; run `python -m scripts.tune_hnsw` to pick values for your corpus
+    space: str = "cosine"
+    M: int = 16
+    construction_ef: int = 100
+    search_ef: int = 10
+    # per-collection overrides, e.g. {"telemetry_records": {"M": 32, "search_ef": 64}}
+    overrides: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+@dataclass
+class DeadlineConfig:
+    request_budget_s: float = 60.0    # per-request budget used by the app
+    ollama_timeout_s: float = 120.0   # used when no deadline is given
+    min_generation_s: float = 1.0     # below this, skip the LLM call entirely
+    ollama_tokens_per_s: float = 15.0 # expected decode speed, scales num_predict
+
+@dataclass
+class ShardingConfig:
+    shard_telemetry: bool = False   # one telemetry collection per aircraft
+    shard_manuals: bool = False     # one manual collection per model family
+    # glob on the source filename -> aircraft id, for logs without an aircraft column
+    aircraft_by_source: Dict[str, str] = field(default_factory=dict)
+    # glob on the manual filename -> model family, e.g. {"quad_*": "quad"}
+    family_by_source: Dict[str, str] = field(default_factory=dict)
+    default_family: str = "general"
 
 paths = Paths()
 models = Models()
 retrieval_cfg = RetrievalConfig()
+ingestion_cfg = IngestionConfig()
+vector_store_cfg = VectorStoreConfig()
+tail_cfg = TailConfig()
+embedding_cfg = EmbeddingConfig()
+hnsw_cfg = HnswConfig()
+deadline_cfg = DeadlineConfig()
+sharding_cfg = ShardingConfig()
@@ -7,12 +7,16 @@ Outputs:
     - List[dict] where dict = {"text": "...", "metadata": {...}}
 """
 
+import io
+import json
 import os
+import time
 from pathlib import Path
 import csv
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 
-from .config import paths
+from .config import paths, ingestion_cfg
 
 # pdfplumber is optional; handle gracefully
 try:
@@ -27,57 +31,75 @@ except ImportError:
 # 1. MANUAL LOADING (TXT + optional PDF)
 # -----------------------------------------------------------
 
-def load_manual_pdfs() -> List[Dict[str, Any]]:
+def _resolve_workers(workers: Optional[int]) -> int:
+    """
+    None -> ingestion_cfg.workers, 0 -> one worker per CPU core.
+    """
+    if workers is None:
+        workers = ingestion_cfg.workers
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _load_manual_file(path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Reads a single .txt / .pdf manual. Returns None if empty or unreadable.
+    Top-level so it can run inside a worker process.
+    """
+    try:
+        if path.suffix.lower() == ".pdf":
+            with pdfplumber.open(path) as pdf:
+                pages = [page.extract_text() or "" for page in pdf.pages]
+                text = "\n".join(pages)
+        else:
+            text = path.read_text(encoding="utf-8", errors="ignore")
+    except Exception as e:
+        print(f"[ERROR] Failed to read manual {path}: {e}")
+        return None
+
+    if not text.strip():
+        print(f"[WARN] Manual empty: {path.name}")
+        return None
+
+    return {
+        "text": text,
+        "metadata": {"source": path.name}
+    }
+
+
+def load_manual_pdfs(workers: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Loads manuals from /data/manuals/ as dicts:
         [{"text": "...", "metadata": {"source": filename}}, ...]
     Supports:
         - .txt
         - .pdf   (if pdfplumber installed)
+
+    workers > 1 spreads files across a process pool (PDF text extraction
+    is CPU bound). Output order is the same as the serial path.
     """
     manual_dir = paths.manuals_dir
-    docs = []
+    workers = _resolve_workers(workers)
 
     print(f"[INFO] Manual directory: {manual_dir}")
 
-    # ---------------------
-    # Load TXT manuals
-    # ---------------------
-    for txt_path in manual_dir.glob("*.txt"):
-        try:
-            text = txt_path.read_text(encoding="utf-8", errors="ignore")
-            if text.strip():
-                docs.append({
-                    "text": text,
-                    "metadata": {"source": txt_path.name}
-                })
-            else:
-                print(f"[WARN] TXT manual empty: {txt_path.name}")
-        except Exception as e:
-            print(f"[ERROR] Failed to read TXT manual {txt_path}: {e}")
+    files = sorted(manual_dir.glob("*.txt"))
 
-    # ---------------------
-    # Load PDF manuals
-    # ---------------------
     if PDF_AVAILABLE:
-        for pdf_path in manual_dir.glob("*.pdf"):
-            try:
-                with pdfplumber.open(pdf_path) as pdf:
-                    pages = [page.extract_text() or "" for page in pdf.pages]
-                    text = "\n".join(pages)
-                    if text.strip():
-                        docs.append({
-                            "text": text,
-                            "metadata": {"source": pdf_path.name}
-                        })
-                    else:
-                        print(f"[WARN] PDF manual empty: {pdf_path.name}")
-            except Exception as e:
-                print(f"[ERROR] Failed to read PDF manual {pdf_path}: {e}")
+        files += sorted(manual_dir.glob("*.pdf"))
     else:
         if list(manual_dir.glob("*.pdf")):
             print("[WARN] PDF files detected but pdfplumber not installed.")
 
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            loaded = list(pool.map(_load_manual_file, files))
+    else:
+        loaded = [_load_manual_file(f) for f in files]
+
+    docs = [d for d in loaded if d is not None]
+
     print(f"[INFO] Loaded {len(docs)} manual documents.\n")
     return docs
 
@@ -86,64 +108,306 @@ def load_manual_pdfs() -> List[Dict[str, Any]]:
 # 2. TELEMETRY CSV LOADING
 # -----------------------------------------------------------
 
-def load_telemetry_files() -> List[Dict[str, Any]]:
+TIMESTAMP_KEYS = ["timestamp", "time", "t"]
+AIRCRAFT_KEYS = ["aircraft_id", "aircraft", "airframe", "tail_number", "tail"]
+
+
+def _format_telemetry_row(row: Dict[str, Any], source: str) -> Optional[Dict[str, Any]]:
     """
-    Loads all telemetry CSVs from /data/logs/.
-    Produces one RAG record per row, formatted as:
-        {
-          "text": "IMU AccX=..., AccY=..., GPS HDOP=..., etc.",
-          "metadata": {"source": filename, "timestamp": maybe}
-        }
+    Turns one csv.DictReader row into a RAG record, or None if it has no values.
     """
-    logs_dir = paths.logs_dir
-    telemetry_records = []
+    if not row:
+        return None
 
-    print(f"[INFO] Telemetry logs directory: {logs_dir}")
+    # Build a readable telemetry string for RAG
+    text_parts = []
+    timestamp = None
+    aircraft = None
+
+    for key, value in row.items():
+        if key is None or value is None:
+            continue
+
+        key_clean = key.strip()
+        val_clean = str(value).strip()
+
+        if not val_clean:
+            continue
+
+        # Detect possible timestamp
+        if key_clean.lower() in TIMESTAMP_KEYS:
+            timestamp = val_clean
+        elif key_clean.lower() in AIRCRAFT_KEYS:
+            aircraft = val_clean
+
+        text_parts.append(f"{key_clean}: {val_clean}")
+
+    if not text_parts:
+        return None
+
+    metadata = {
+        "source": source,
+        "timestamp": timestamp or "unknown"
+    }
+    if aircraft:
+        metadata["aircraft"] = aircraft
+
+    return {
+        "text": ", ".join(text_parts),
+        "metadata": metadata
+    }
+
+
+def _format_telemetry_rows(header: List[str], rows: Iterable[List[str]], source: str) -> List[Dict[str, Any]]:
+    """
+    Equivalent of _format_telemetry_row over csv.reader rows, without
+    building a dict per row. Fields beyond the header are ignored and
+    missing trailing fields skipped, exactly as csv.DictReader does.
+    """
+    keys = [k.strip() for k in header]
+    n = len(keys)
+    ts_idx = [i for i, k in enumerate(keys) if k.lower() in TIMESTAMP_KEYS]
+    ac_idx = [i for i, k in enumerate(keys) if k.lower() in AIRCRAFT_KEYS]
+
+    records = []
+    for row in rows:
+        values = [v.strip() for v in row[:n]]
+        text = ", ".join([k + ": " + v for k, v in zip(keys, values) if v])
+        if not text:
+            continue
+
+        # last non-empty matching column wins, as in _format_telemetry_row
+        timestamp, aircraft = "unknown", None
+        for i in ts_idx:
+            if i < len(values) and values[i]:
+                timestamp = values[i]
+        for i in ac_idx:
+            if i < len(values) and values[i]:
+                aircraft = values[i]
+
+        metadata = {"source": source, "timestamp": timestamp}
+        if aircraft:
+            metadata["aircraft"] = aircraft
+        records.append({"text": text, "metadata": metadata})
+    return records
+
+
+def _plan_csv_shards(
+    csv_path: Path,
+    shard_bytes: int,
+    size: Optional[int] = None,
+) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    Splits a CSV (its first `size` bytes, default all) into newline-aligned
+    byte ranges of roughly shard_bytes.
+    Returns (header_line, [(start, end), ...]) covering every data row once.
+
+    Assumes no quoted field contains a newline (true for telemetry logs).
+    """
+    if size is None:
+        size = csv_path.stat().st_size
+
+    with csv_path.open("rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+
+        bounds = [data_start]
+        pos = data_start
+        while pos + shard_bytes < size:
+            f.seek(pos + shard_bytes)
+            f.readline()              # move to the start of the next row
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+
+    bounds.append(size)
+    ranges = [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    return header, ranges
+
+
+def _parse_csv_shard(csv_path: str, header: bytes, start: int, end: int) -> List[Dict[str, Any]]:
+    """
+    Worker task: parse one byte range of a CSV.
+    """
+    path = Path(csv_path)
+    with path.open("rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
 
-    for csv_path in logs_dir.glob("*.csv"):
+    if not data.strip():
+        return []
+
+    fields = next(csv.reader([header.decode("utf-8", errors="ignore")]), [])
+    text = io.StringIO(data.decode("utf-8", errors="ignore"))
+
+    if len(set(fields)) != len(fields):
+        # duplicate column names: keep csv.DictReader's last-one-wins semantics
+        rows = (_format_telemetry_row(row, path.name) for row in csv.DictReader(text, fieldnames=fields))
+        return [r for r in rows if r is not None]
+
+    return _format_telemetry_rows(fields, csv.reader(text), path.name)
+
+
+def _open_log(csv_path: Path, end: Optional[int]):
+    if end is None:
+        return csv_path.open("r", encoding="utf-8", errors="ignore")
+    with csv_path.open("rb") as f:
+        return io.StringIO(f.read(end).decode("utf-8", errors="ignore"))
+
+
+def _load_telemetry_serial(csv_paths: List[Path], ends: Dict[str, int]) -> List[Dict[str, Any]]:
+    telemetry_records = []
+
+    for csv_path in csv_paths:
         print(f"[INFO] Reading telemetry CSV: {csv_path.name}")
 
         try:
-            with csv_path.open("r", encoding="utf-8", errors="ignore") as f:
+            with _open_log(csv_path, ends.get(csv_path.name)) as f:
                 reader = csv.DictReader(f)
 
                 for row in reader:
-                    if not row:
-                        continue
+                    record = _format_telemetry_row(row, csv_path.name)
+                    if record is not None:
+                        telemetry_records.append(record)
+
+        except Exception as e:
+            print(f"[ERROR] Failed to read CSV log {csv_path}: {e}")
+
+    return telemetry_records
 
-                    # Build a readable telemetry string for RAG
-                    text_parts = []
-                    timestamp = None
 
-                    for key, value in row.items():
-                        if key is None or value is None:
-                            continue
+def _load_telemetry_parallel(csv_paths: List[Path], workers: int, ends: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    Fans (file, byte-range) shards out over a process pool and merges the
+    results back in (file order, shard order), so the output — and the
+    chunk IDs derived from its positions — match the serial loader.
+    """
+    tasks = []
+    for csv_path in csv_paths:
+        try:
+            header, ranges = _plan_csv_shards(csv_path, ingestion_cfg.shard_bytes, ends.get(csv_path.name))
+        except Exception as e:
+            print(f"[ERROR] Failed to read CSV log {csv_path}: {e}")
+            continue
+
+        print(f"[INFO] Reading telemetry CSV: {csv_path.name} ({len(ranges)} shard(s))")
+        for start, end in ranges:
+            tasks.append((csv_path, header, start, end))
+
+    telemetry_records = []
+    if not tasks:
+        return telemetry_records
 
-                        key_clean = key.strip()
-                        val_clean = str(value).strip()
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = [
+            pool.submit(_parse_csv_shard, str(p), header, start, end)
+            for p, header, start, end in tasks
+        ]
 
-                        if not val_clean:
-                            continue
+        failed = set()
+        for (csv_path, _, start, end), fut in zip(tasks, futures):
+            try:
+                telemetry_records.extend(fut.result())
+            except Exception as e:
+                if csv_path not in failed:
+                    print(f"[ERROR] Failed to read CSV log {csv_path} (bytes {start}-{end}): {e}")
+                failed.add(csv_path)
 
-                        # Detect possible timestamp
-                        if key_clean.lower() in ["timestamp", "time", "t"]:
-                            timestamp = val_clean
+    return telemetry_records
 
-                        text_parts.append(f"{key_clean}: {val_clean}")
 
-                    if not text_parts:
-                        continue
+def _last_line_end(f, size: int) -> int:
+    """
+    Offset just past the last newline in the first `size` bytes of f (0 if none).
+    """
+    pos = size
+    while pos > 0:
+        step = min(64 * 1024, pos)
+        f.seek(pos - step)
+        newline = f.read(step).rfind(b"\n")
+        if newline >= 0:
+            return pos - step + newline + 1
+        pos -= step
+    return 0
 
-                    telemetry_records.append({
-                        "text": ", ".join(text_parts),
-                        "metadata": {
-                            "source": csv_path.name,
-                            "timestamp": timestamp or "unknown"
-                        }
-                    })
 
-        except Exception as e:
+def log_read_offsets() -> Dict[str, Dict[str, Any]]:
+    """
+    Snapshot of data/logs/ before a build reads it:
+        {filename: {"inode": ..., "offset": ..., "header": [...]}}
+    where offset is the end of the last complete line. Passed to
+    load_telemetry_files(), it bounds what the build reads; saved with
+    save_read_offsets() once the build is live, it tells the tailer where
+    to resume so rows appended during the build are not lost.
+    """
+    offsets = {}
+    for csv_path in sorted(paths.logs_dir.glob("*.csv")):
+        try:
+            st = csv_path.stat()
+            with csv_path.open("rb") as f:
+                header_line = f.readline()
+                end = _last_line_end(f, st.st_size)
+        except OSError as e:
             print(f"[ERROR] Failed to read CSV log {csv_path}: {e}")
+            continue
+
+        # no complete line yet: the tailer will read the header itself
+        header = next(csv.reader([header_line.decode("utf-8", errors="ignore")]), []) if end else []
+        offsets[csv_path.name] = {"inode": st.st_ino, "offset": end, "header": header}
+    return offsets
+
+
+def save_read_offsets(build_id: str, offsets: Dict[str, Dict[str, Any]]):
+    """
+    Publishes what build `build_id` read (see log_read_offsets) for the
+    tailer. Call it only after the build's collections are live.
+    """
+    paths.build_offsets_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = paths.build_offsets_file.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps({"build_id": build_id, "files": offsets}, indent=2), encoding="utf-8")
+    os.replace(tmp, paths.build_offsets_file)
+
+
+def load_telemetry_files(
+    workers: Optional[int] = None,
+    offsets: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Loads all telemetry CSVs from /data/logs/.
+    Produces one RAG record per row, formatted as:
+        {
+          "text": "IMU AccX=..., AccY=..., GPS HDOP=..., etc.",
+          "metadata": {"source": filename, "timestamp": maybe}
+        }
+
+    workers > 1 splits files into byte-range shards (ingestion_cfg.shard_bytes)
+    parsed in parallel; workers == 1 keeps the csv.DictReader path.
+
+    With `offsets` (from log_read_offsets), only those files are read, each
+    up to its recorded offset.
+    """
+    logs_dir = paths.logs_dir
+    workers = _resolve_workers(workers)
+
+    print(f"[INFO] Telemetry logs directory: {logs_dir}")
+
+    csv_paths = sorted(logs_dir.glob("*.csv"))
+    ends: Dict[str, int] = {}
+    if offsets is not None:
+        csv_paths = [p for p in csv_paths if p.name in offsets]
+        ends = {name: entry["offset"] for name, entry in offsets.items()}
+    t0 = time.perf_counter()
+
+    if workers > 1:
+        print(f"[INFO] Parallel telemetry ingestion with {workers} workers")
+        telemetry_records = _load_telemetry_parallel(csv_paths, workers, ends)
+    else:
+        telemetry_records = _load_telemetry_serial(csv_paths, ends)
+
+    elapsed = time.perf_counter() - t0
+    rate = len(telemetry_records) / elapsed if elapsed > 0 else 0.0
 
-    print(f"[INFO] Loaded telemetry records: {len(telemetry_records)}\n")
+    print(f"[INFO] Loaded telemetry records: {len(telemetry_records)} "
+          f"({elapsed:.1f}s, {rate:,.0f} rows/s)\n")
     return telemetry_records
@@ -0,0 +1,30 @@
+import time
+from typing import Optional
+
+
+class Deadline:
+    """
+    Absolute per-request time budget, passed through retrieval and generation.
+    Each stage asks for remaining() and gives up (returning what it has)
+    once it reaches zero.
+    """
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def __repr__(self) -> str:
+        return f"Deadline(budget={self.budget_s:.2f}s, remaining={self.remaining():.2f}s)"
+
+
+def remaining_or(deadline: Optional[Deadline], default: Optional[float]) -> Optional[float]:
+    """
+    Seconds left on `deadline`, or `default` when there is no deadline.
+    """
+    return default if deadline is None else deadline.remaining()
@@ -1,9 +1,19 @@
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from sentence_transformers import SentenceTransformer
-from typing import List
-from .config import models
+from typing import List, Optional
+import numpy as np
+from .config import models, embedding_cfg
 
 _model = None
 
+# Build-time worker pool (see start_embedding_pool)
+_pool = None
+_pool_workers = 0
+_pool_stats = {"texts": 0, "seconds": 0.0}
+
 def get_embedding_model():
     global _model
     if _model is None:
@@ -11,7 +21,117 @@ def get_embedding_model():
         _model = SentenceTransformer(models.embedding_model_name)
     return _model
 
+def _init_pool_worker(model_name: str, torch_threads: int):
+    """
+    Runs once in each worker process: pin torch's intra-op threads and
+    load a private copy of the model.
+    """
+    global _model
+    import torch
+    torch.set_num_threads(torch_threads)
+    _model = SentenceTransformer(model_name)
+
+def _encode_batch(task):
+    batch_idx, texts = task
+    emb = _model.encode(
+        texts,
+        batch_size=len(texts),
+        convert_to_numpy=True,
+        show_progress_bar=False,
+        normalize_embeddings=True
+    )
+    return batch_idx, emb
+
+def start_embedding_pool(workers: Optional[int] = None, torch_threads: Optional[int] = None):
+    """
+    Start N embedding worker processes, each with its own model copy.
+    While the pool is running, embed_texts() spreads large inputs across it.
+    Meant for index builds; queries keep using the in-process model.
+    """
+    global _pool, _pool_workers
+
+    if workers is None:
+        workers = embedding_cfg.workers
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if torch_threads is None:
+        torch_threads = embedding_cfg.torch_threads
+    if torch_threads <= 0:
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    if workers == 1:
+        return
+
+    stop_embedding_pool()
+
+    # tokenizers' own thread pool does not survive fork and fights the workers
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    print(f"[INFO] Starting embedding pool: {workers} workers × {torch_threads} torch threads")
+    # ProcessPoolExecutor, not multiprocessing.Pool: a worker that dies in the
+    # initializer (e.g. the model fails to load) breaks the pool and raises
+    # BrokenProcessPool, instead of being respawned forever.
+    _pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_pool_worker,
+        initargs=(models.embedding_model_name, torch_threads),
+    )
+    _pool_workers = workers
+    _pool_stats["texts"] = 0
+    _pool_stats["seconds"] = 0.0
+
+def stop_embedding_pool():
+    global _pool, _pool_workers
+    if _pool is None:
+        return
+
+    _pool.shutdown(wait=True, cancel_futures=True)
+
+    secs = _pool_stats["seconds"]
+    rate = _pool_stats["texts"] / secs if secs > 0 else 0.0
+    print(f"[INFO] Embedding pool stopped: {_pool_stats['texts']} texts in {secs:.1f}s "
+          f"({rate:,.0f} texts/s, {_pool_workers} workers)")
+
+    _pool = None
+    _pool_workers = 0
+
+def embedding_pool_workers() -> int:
+    """0 when no pool is running."""
+    return _pool_workers
+
+def _embed_with_pool(texts: List[str]):
+    """
+    Length-sorted batches so each batch pads to similar lengths, fanned out
+    over the pool and scattered back into the caller's order.
+    """
+    t0 = time.perf_counter()
+
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    bs = embedding_cfg.batch_size
+    tasks = [
+        (i, [texts[j] for j in order[start:start + bs]])
+        for i, start in enumerate(range(0, len(texts), bs))
+    ]
+
+    out = None
+    for batch_idx, emb in _pool.map(_encode_batch, tasks):
+        if out is None:
+            out = np.empty((len(texts), emb.shape[1]), dtype=emb.dtype)
+        start = batch_idx * bs
+        out[order[start:start + len(emb)]] = emb
+
+    elapsed = time.perf_counter() - t0
+    _pool_stats["texts"] += len(texts)
+    _pool_stats["seconds"] += elapsed
+    print(f"[INFO] Embedded {len(texts)} texts in {elapsed:.2f}s "
+          f"({len(texts) / elapsed:,.0f} texts/s on {_pool_workers} workers)")
+    return out
+
 def embed_texts(texts: List[str]):
+    if _pool is not None and len(texts) > embedding_cfg.batch_size:
+        return _embed_with_pool(texts)
+
     model = get_embedding_model()
     embeddings = model.encode(
         texts,
@@ -0,0 +1,197 @@
+"""
+Local stand-in for the Ollama /api/generate endpoint, for load tests.
+
+Simulates a model server with `parallel` decoding slots (like
+OLLAMA_NUM_PARALLEL): each request waits for a free slot, pays a prompt
+processing cost proportional to the prompt length, then emits tokens at
+`token_latency_s` each. Both streaming and non-streaming responses use
+Ollama's JSON format, so call_ollama() works against it unchanged. Like
+Ollama, it speaks HTTP/1.1 and streams each NDJSON line as its own chunk,
+so clients see every token when it is generated.
+
+    server = FakeOllamaServer(token_latency_s=0.02, parallel=2).start()
+    models.ollama_url = server.url
+    ...
+    server.stop()
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+_WORDS = (
+    "Check the ESC temperature trend against throttle; a rising baseline "
+    "suggests degraded cooling or a failing motor bearing. Inspect wiring, "
+    "connectors and propeller balance, then repeat the hover test."
+).split()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"   # keep-alive and chunked streaming, as Ollama
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/api/tags"):
+            self._send_json(200, {"models": [{"name": "fake"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": f"bad request: {e}"})
+            return
+
+        fake = self.server.fake
+        options = payload.get("options") or {}
+        num_predict = int(options.get("num_predict", fake.response_tokens))
+        # Ollama treats num_predict <= 0 as "no limit"
+        num_tokens = fake.response_tokens if num_predict <= 0 else min(fake.response_tokens, num_predict)
+        model = payload.get("model", "fake")
+
+        t0 = time.perf_counter()
+        with fake._slot():
+            time.sleep(fake.prompt_latency_s_per_kchar * len(payload.get("prompt", "")) / 1000.0)
+
+            if payload.get("stream", True):
+                self._stream(model, num_tokens, t0)
+            else:
+                for _ in range(num_tokens):
+                    time.sleep(fake.token_latency_s)
+                text = "".join(self._token(i) for i in range(num_tokens))
+                self._send_json(200, self._chunk(model, text, True, t0, num_tokens))
+
+    def _stream(self, model: str, num_tokens: int, t0: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i in range(num_tokens):
+                time.sleep(self.server.fake.token_latency_s)
+                self._write_line(self._chunk(model, self._token(i), False, t0))
+            self._write_line(self._chunk(model, "", True, t0, num_tokens))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # client hit its deadline and hung up
+            self.server.fake._count("disconnects")
+            self.close_connection = True
+
+    @staticmethod
+    def _token(i: int) -> str:
+        return _WORDS[i % len(_WORDS)] + " "
+
+    @staticmethod
+    def _chunk(model: str, text: str, done: bool, t0: float, eval_count: int = 0) -> Dict[str, Any]:
+        chunk: Dict[str, Any] = {"model": model, "response": text, "done": done}
+        if done:
+            chunk["eval_count"] = eval_count
+            chunk["total_duration"] = int((time.perf_counter() - t0) * 1e9)
+        return chunk
+
+    def _write_line(self, obj: Dict[str, Any]):
+        # one HTTP chunk per line, so nothing waits for a buffer to fill
+        line = json.dumps(obj).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def _send_json(self, status: int, obj: Dict[str, Any]):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeOllamaServer"
+
+
+class FakeOllamaServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        token_latency_s: float = 0.02,
+        prompt_latency_s_per_kchar: float = 0.01,
+        response_tokens: int = 128,
+        parallel: int = 1,
+    ):
+        self.token_latency_s = token_latency_s
+        self.prompt_latency_s_per_kchar = prompt_latency_s_per_kchar
+        self.response_tokens = response_tokens
+        self.parallel = parallel
+
+        self._slots = threading.BoundedSemaphore(parallel)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "active": 0, "waiting": 0, "max_waiting": 0, "disconnects": 0}
+
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.update(requests=0, max_waiting=0, disconnects=0)
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    @contextmanager
+    def _slot(self):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["waiting"] += 1
+            self._stats["max_waiting"] = max(self._stats["max_waiting"], self._stats["waiting"])
+        self._slots.acquire()
+        with self._lock:
+            self._stats["waiting"] -= 1
+            self._stats["active"] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stats["active"] -= 1
+            self._slots.release()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
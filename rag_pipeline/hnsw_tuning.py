@@ -0,0 +1,215 @@
+"""
+HNSW recall / latency tuner.
+
+Samples vectors from a live collection, builds throwaway in-memory Chroma
+collections for each (M, construction_ef, search_ef) candidate, and
+measures against exact brute-force search:
+
+    - recall@k        (fraction of the true top-k returned)
+    - p50 / p99 query latency
+    - build time and index memory (estimated from hnswlib's layout, plus the
+      process RSS growth observed during the build where /proc is available)
+
+recommend() then picks the cheapest setting that meets a recall target.
+"""
+
+import itertools
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import chromadb
+import numpy as np
+
+from .config import hnsw_cfg
+from .vector_store import _client, get_shards, resolve_collection_name
+
+
+@dataclass
+class TuningResult:
+    M: int
+    construction_ef: int
+    search_ef: int
+    recall: float
+    p50_ms: float
+    p99_ms: float
+    build_s: float
+    est_index_mb: float
+    rss_delta_mb: Optional[float]
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    import resource
+    return pages * resource.getpagesize()
+
+
+def estimate_index_bytes(n: int, dim: int, M: int) -> int:
+    """
+    hnswlib keeps, per element: the float32 vector, a level-0 link list of
+    2*M ids plus a count, and an 8-byte label. About 1/M of the elements
+    also carry M upper-level links.
+    """
+    level0 = n * (dim * 4 + 2 * M * 4 + 4 + 8)
+    upper = int(n / max(M, 2)) * (M * 4 + 4)
+    return level0 + upper
+
+
+def sample_vectors(collection_name: str, sample_size: int, seed: int = 0) -> np.ndarray:
+    """
+    Random sample of stored embeddings from the live version of a collection.
+    A sharded collection is sampled across all its shards.
+    """
+    targets = [e["collection"] for e in get_shards(collection_name).values()] or [collection_name]
+    collections = [_client.get_collection(name=resolve_collection_name(t)) for t in targets]
+
+    pool = [(c, i) for c in collections for i in c.get(include=[])["ids"]]
+    if not pool:
+        raise ValueError(f"Collection '{collection_name}' is empty")
+
+    rng = np.random.default_rng(seed)
+    if len(pool) > sample_size:
+        pool = [pool[i] for i in sorted(rng.choice(len(pool), size=sample_size, replace=False))]
+
+    vectors = []
+    for collection in collections:
+        ids = [i for c, i in pool if c is collection]
+        for start in range(0, len(ids), 5000):
+            res = collection.get(ids=ids[start:start + 5000], include=["embeddings"])
+            vectors.extend(res["embeddings"])
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    # queries are taken from the front of the sample: don't let one shard supply them all
+    return vectors[rng.permutation(len(vectors))]
+
+
+def exact_top_k(base: np.ndarray, queries: np.ndarray, k: int, space: str = "cosine") -> np.ndarray:
+    """
+    Brute-force ground truth: indices of the k nearest base vectors per query.
+    """
+    if space == "l2":
+        d = (queries ** 2).sum(1)[:, None] - 2 * queries @ base.T + (base ** 2).sum(1)[None, :]
+        return np.argsort(d, axis=1)[:, :k]
+
+    if space == "cosine":
+        base = base / np.linalg.norm(base, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    sims = queries @ base.T
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+def evaluate_setting(
+    base: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    M: int,
+    construction_ef: int,
+    search_ef: int,
+    k: int,
+    space: str = "cosine",
+) -> TuningResult:
+    client = chromadb.EphemeralClient()
+    name = f"hnsw_tune_M{M}_c{construction_ef}_s{search_ef}"
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+
+    rss_before = _rss_bytes()
+    t0 = time.perf_counter()
+    collection = client.create_collection(
+        name=name,
+        metadata={
+            "hnsw:space": space,
+            "hnsw:M": M,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": search_ef,
+        },
+    )
+    ids = [str(i) for i in range(len(base))]
+    for start in range(0, len(base), 5000):
+        collection.add(ids=ids[start:start + 5000], embeddings=base[start:start + 5000].tolist())
+    build_s = time.perf_counter() - t0
+    rss_after = _rss_bytes()
+
+    latencies = []
+    hits = 0
+    for q, true_ids in zip(queries, truth):
+        t0 = time.perf_counter()
+        res = collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])
+        latencies.append(time.perf_counter() - t0)
+        found = {int(i) for i in res["ids"][0]}
+        hits += len(found.intersection(true_ids.tolist()))
+
+    client.delete_collection(name)
+
+    lat_ms = np.asarray(latencies) * 1000.0
+    rss_delta = None
+    if rss_before is not None and rss_after is not None:
+        rss_delta = max(0, rss_after - rss_before) / 1e6
+
+    return TuningResult(
+        M=M,
+        construction_ef=construction_ef,
+        search_ef=search_ef,
+        recall=hits / (len(queries) * k),
+        p50_ms=float(np.percentile(lat_ms, 50)),
+        p99_ms=float(np.percentile(lat_ms, 99)),
+        build_s=build_s,
+        est_index_mb=estimate_index_bytes(len(base), base.shape[1], M) / 1e6,
+        rss_delta_mb=rss_delta,
+    )
+
+
+def tune_hnsw(
+    collection_name: str,
+    sample_size: int = 5000,
+    num_queries: int = 200,
+    k: int = 10,
+    Ms: Sequence[int] = (8, 16, 32, 48),
+    construction_efs: Sequence[int] = (64, 100, 200),
+    search_efs: Sequence[int] = (10, 32, 64, 128),
+    seed: int = 0,
+) -> List[TuningResult]:
+    """
+    Grid-evaluates HNSW settings on a sample of `collection_name`.
+    Held-out sample vectors act as queries.
+    """
+    vectors = sample_vectors(collection_name, sample_size + num_queries, seed=seed)
+    if len(vectors) <= num_queries:
+        raise ValueError(f"Need more than {num_queries} vectors, got {len(vectors)}")
+
+    queries, base = vectors[:num_queries], vectors[num_queries:]
+    k = min(k, len(base))
+    truth = exact_top_k(base, queries, k, space=hnsw_cfg.space)
+
+    print(f"[INFO] Tuning '{collection_name}': {len(base)} base vectors, "
+          f"{len(queries)} queries, dim={base.shape[1]}, k={k}")
+
+    results = []
+    for M, c_ef, s_ef in itertools.product(Ms, construction_efs, search_efs):
+        res = evaluate_setting(base, queries, truth, M, c_ef, s_ef, k, space=hnsw_cfg.space)
+        results.append(res)
+        print(f"[INFO] M={M:<3} construction_ef={c_ef:<4} search_ef={s_ef:<4} "
+              f"recall@{k}={res.recall:.3f}  p50={res.p50_ms:.2f}ms  p99={res.p99_ms:.2f}ms  "
+              f"build={res.build_s:.1f}s  mem≈{res.est_index_mb:.1f}MB")
+    return results
+
+
+def recommend(results: List[TuningResult], recall_target: float) -> Optional[TuningResult]:
+    """
+    Cheapest setting meeting recall_target: lowest median latency (to 0.1 ms),
+    then smallest index, then fastest build. None if nothing reaches the target.
+    """
+    ok = [r for r in results if r.recall >= recall_target]
+    if not ok:
+        return None
+    return min(ok, key=lambda r: (round(r.p50_ms, 1), r.est_index_mb, r.build_s))
+
+
+def results_as_dicts(results: List[TuningResult]) -> List[Dict[str, Any]]:
+    return [asdict(r) for r in results]
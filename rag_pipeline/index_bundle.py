@@ -0,0 +1,410 @@
+"""
+Portable prebuilt index bundle.
+
+One file holds everything a node needs to serve queries:
+
+    [ b"AEROIDX\\x00" | u32 format version | u64 manifest length ]
+    [ manifest JSON: build info, embedding-model fingerprint, per-collection
+      offsets / counts / HNSW params ]
+    [ per collection, each block page-aligned:
+        float32 vectors (count x dim, C order)
+        u64 row index (count + 1 byte offsets into the payload)
+        payload: one JSON row [id, document, metadata] per item, concatenated ]
+
+load_bundle() maps the file read-only with mmap; vectors and the row index
+are zero-copy NumPy views, and payload rows are parsed only when a query
+returns them, so a fresh node can answer queries (exact cosine search over
+the mapped vectors) without reading the corpus text. prefetch asks the
+kernel to read the whole file ahead; warm_up() also loads the embedding
+model and runs one query per collection.
+
+A bundle is rejected if the local embedding model does not reproduce the
+fingerprint recorded at export time.
+"""
+
+import hashlib
+import json
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import models
+from .embeddings import embed_texts
+from .vector_store import _client, get_shards, resolve_collection_name, set_shards
+
+MAGIC = b"AEROIDX\x00"
+FORMAT_VERSION = 2
+_LEGACY_VERSIONS = (1,)   # single JSON payload per collection, parsed at open
+_PREAMBLE = struct.Struct("<8sIQ")
+_ALIGN = mmap.PAGESIZE
+
+DEFAULT_COLLECTIONS = ("manual_chunks", "telemetry_records")
+
+# Fixed probe texts; their embeddings identify the model + weights + pooling.
+_FINGERPRINT_PROBES = [
+    "ESC temperature exceeded limits during climb",
+    "GPS HDOP spike followed by position hold failure",
+    "IMU vibration levels on the Z axis",
+]
+_FINGERPRINT_MIN_COSINE = 0.999
+
+
+def model_fingerprint() -> Dict[str, Any]:
+    probes = np.asarray(embed_texts(_FINGERPRINT_PROBES), dtype=np.float32)
+    return {
+        "name": models.embedding_model_name,
+        "dim": int(probes.shape[1]),
+        "probe_sha256": hashlib.sha256(np.round(probes, 4).tobytes()).hexdigest(),
+        "probe_vectors": probes.tolist(),
+    }
+
+
+def check_fingerprint(expected: Dict[str, Any]):
+    """
+    Raises ValueError unless the local embedding model matches `expected`.
+    Probe vectors are compared by cosine so BLAS rounding differences pass.
+    """
+    local = model_fingerprint()
+    if local["name"] != expected["name"] or local["dim"] != expected["dim"]:
+        raise ValueError(
+            f"Embedding model mismatch: bundle was built with {expected['name']} "
+            f"(dim {expected['dim']}), this node uses {local['name']} (dim {local['dim']})"
+        )
+
+    a = np.asarray(expected["probe_vectors"], dtype=np.float32)
+    b = np.asarray(local["probe_vectors"], dtype=np.float32)
+    cos = (a * b).sum(1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    if cos.min() < _FINGERPRINT_MIN_COSINE:
+        raise ValueError(
+            f"Embedding model mismatch: {local['name']} produces different vectors than the "
+            f"model the bundle was built with (probe cosine {cos.min():.4f})"
+        )
+
+
+def _pad(f, align: int = _ALIGN) -> int:
+    pos = f.tell()
+    gap = (-pos) % align
+    if gap:
+        f.write(b"\0" * gap)
+    return pos + gap
+
+
+# -----------------------------------------------------------
+# 1. EXPORT
+# -----------------------------------------------------------
+
+def _dump_collection(name: str, page_size: int = 5000) -> Dict[str, Any]:
+    physical = resolve_collection_name(name)
+    collection = _client.get_collection(name=physical)
+
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    vectors: List[np.ndarray] = []
+
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        res = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=page_size,
+            offset=offset,
+        )
+        ids.extend(res["ids"])
+        documents.extend(res["documents"])
+        metadatas.extend(m or {} for m in res["metadatas"])
+        vectors.append(np.asarray(res["embeddings"], dtype=np.float32))
+
+    return {
+        "physical_name": physical,
+        "hnsw": {k: v for k, v in (collection.metadata or {}).items() if k.startswith("hnsw:")},
+        "ids": ids,
+        "documents": documents,
+        "metadatas": metadatas,
+        "vectors": np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32),
+    }
+
+
+def export_bundle(path: Path, collections: Sequence[str] = DEFAULT_COLLECTIONS) -> Dict[str, Any]:
+    """
+    Writes the live versions of `collections` to a single bundle file.
+    Sharded collections are exported shard by shard, with their shard map.
+    """
+    t0 = time.perf_counter()
+
+    shards = {name: get_shards(name) for name in collections if get_shards(name)}
+    physical = []
+    for name in collections:
+        if name in shards:
+            physical.extend(entry["collection"] for entry in shards[name].values())
+        else:
+            physical.append(name)
+
+    dumps = {name: _dump_collection(name) for name in physical}
+
+    manifest: Dict[str, Any] = {
+        "format_version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "embedding_model": model_fingerprint(),
+        "build": {name: d["physical_name"] for name, d in dumps.items()},
+        "shards": shards,
+        "collections": {},
+    }
+
+    payloads: Dict[str, bytes] = {}
+    row_index: Dict[str, np.ndarray] = {}
+    for name, d in dumps.items():
+        rows = [
+            json.dumps([i, doc, meta], ensure_ascii=False).encode("utf-8")
+            for i, doc, meta in zip(d["ids"], d["documents"], d["metadatas"])
+        ]
+        payloads[name] = b"".join(rows)
+        row_index[name] = np.concatenate(([0], np.cumsum([len(r) for r in rows]))).astype("<u8")
+
+    # Lay out blocks first so the manifest can carry absolute offsets; the
+    # manifest length feeds back into the offsets, so iterate until it fits.
+    def _layout(header_len: int) -> int:
+        pos = _PREAMBLE.size + header_len
+        for name, d in dumps.items():
+            pos += (-pos) % _ALIGN
+            vec = d["vectors"]
+            manifest["collections"][name] = {
+                "count": int(vec.shape[0]),
+                "dim": int(vec.shape[1]) if vec.ndim == 2 else 0,
+                "hnsw": d["hnsw"],
+                "vectors": {"offset": pos, "nbytes": int(vec.nbytes)},
+            }
+            pos += vec.nbytes
+            pos += (-pos) % _ALIGN
+            manifest["collections"][name]["row_index"] = {"offset": pos, "nbytes": int(row_index[name].nbytes)}
+            pos += row_index[name].nbytes
+            pos += (-pos) % _ALIGN
+            manifest["collections"][name]["payload"] = {"offset": pos, "nbytes": len(payloads[name])}
+            pos += len(payloads[name])
+        return pos
+
+    header_len = 0
+    while True:
+        _layout(header_len)
+        needed = len(json.dumps(manifest).encode("utf-8"))
+        if needed <= header_len:
+            break
+        header_len = needed + 1024
+
+    header = json.dumps(manifest).encode("utf-8").ljust(header_len, b" ")
+
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, header_len))
+        f.write(header)
+        for name, d in dumps.items():
+            meta = manifest["collections"][name]
+            if _pad(f) != meta["vectors"]["offset"]:
+                raise RuntimeError(f"bundle layout mismatch for '{name}' vectors")
+            f.write(np.ascontiguousarray(d["vectors"]).tobytes())
+            if _pad(f) != meta["row_index"]["offset"]:
+                raise RuntimeError(f"bundle layout mismatch for '{name}' row index")
+            f.write(row_index[name].tobytes())
+            if _pad(f) != meta["payload"]["offset"]:
+                raise RuntimeError(f"bundle layout mismatch for '{name}' payload")
+            f.write(payloads[name])
+    tmp.replace(path)
+
+    size_mb = path.stat().st_size / 1e6
+    counts = ", ".join(f"{n}={m['count']}" for n, m in manifest["collections"].items())
+    print(f"[SUCCESS] Exported bundle {path} ({size_mb:.1f} MB, {counts}) "
+          f"in {time.perf_counter() - t0:.1f}s")
+    return manifest
+
+
+# -----------------------------------------------------------
+# 2. LOAD / SERVE
+# -----------------------------------------------------------
+
+class IndexBundle:
+    """
+    Read-only, memory-mapped bundle. query() mirrors Chroma's result shape.
+    """
+
+    def __init__(self, path: Path, prefetch: bool = False, verify_model: bool = True):
+        self.path = Path(path)
+        self.vectors: Dict[str, np.ndarray] = {}
+        self._row_index: Dict[str, np.ndarray] = {}
+        self._legacy_payloads: Dict[str, Dict[str, List[Any]]] = {}
+        self._mm: Optional[mmap.mmap] = None
+        self._file = self.path.open("rb")
+        try:
+            self._open(prefetch, verify_model)
+        except Exception:
+            # rejecting a bundle (wrong model, format, ...) must not leak the mapping
+            self.close()
+            raise
+
+    def _open(self, prefetch: bool, verify_model: bool):
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an AeroSense index bundle")
+        if version != FORMAT_VERSION and version not in _LEGACY_VERSIONS:
+            raise ValueError(f"Unsupported bundle format version {version} (expected {FORMAT_VERSION})")
+
+        self.manifest = json.loads(self._mm[_PREAMBLE.size:_PREAMBLE.size + header_len])
+
+        if verify_model:
+            check_fingerprint(self.manifest["embedding_model"])
+
+        if prefetch and hasattr(self._mm, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+            self._mm.madvise(mmap.MADV_WILLNEED)
+
+        for name, meta in self.manifest["collections"].items():
+            v = meta["vectors"]
+            self.vectors[name] = np.frombuffer(
+                self._mm, dtype=np.float32, count=meta["count"] * meta["dim"], offset=v["offset"],
+            ).reshape(meta["count"], meta["dim"])
+
+            p = meta["payload"]
+            if version in _LEGACY_VERSIONS:
+                self._legacy_payloads[name] = json.loads(self._mm[p["offset"]:p["offset"] + p["nbytes"]])
+            else:
+                self._row_index[name] = np.frombuffer(
+                    self._mm, dtype="<u8", count=meta["count"] + 1, offset=meta["row_index"]["offset"],
+                )
+
+    @property
+    def collections(self) -> List[str]:
+        return list(self.manifest["collections"])
+
+    def rows(self, name: str, indices) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        (id, document, metadata) for the given row numbers, parsed on demand.
+        """
+        legacy = self._legacy_payloads.get(name)
+        if legacy is not None:
+            return [(legacy["ids"][i], legacy["documents"][i], legacy["metadatas"][i]) for i in indices]
+
+        offsets = self._row_index[name]
+        base = self.manifest["collections"][name]["payload"]["offset"]
+        out = []
+        for i in indices:
+            start, end = base + int(offsets[i]), base + int(offsets[i + 1])
+            row_id, document, metadata = json.loads(self._mm[start:end])
+            out.append((row_id, document, metadata))
+        return out
+
+    def warm_up(self):
+        """
+        Touch every vector page and run one query per collection so the
+        first real request does not pay for page faults or model loading.
+        """
+        t0 = time.perf_counter()
+        for vec in self.vectors.values():
+            flat = vec.reshape(-1)
+            if flat.size:
+                float(flat[:: max(1, _ALIGN // 4)].sum())
+
+        probe = embed_texts(["warm-up query"])
+        for name in self.collections:
+            self.query(name, probe, 1)
+        print(f"[INFO] Bundle warm-up done in {time.perf_counter() - t0:.2f}s")
+
+    def query(self, name: str, query_embeddings, n_results: int = 5) -> Optional[Dict[str, Any]]:
+        """
+        Exact cosine search (embeddings are stored L2-normalized).
+        """
+        vectors = self.vectors.get(name)
+        if vectors is None or len(vectors) == 0:
+            return None
+
+        q = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, vectors.shape[1])
+        sims = q @ vectors.T
+        k = min(n_results, vectors.shape[0])
+
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(sims, top, axis=1).argsort(axis=1)[:, ::-1]
+        top = np.take_along_axis(top, order, axis=1)
+        dists = 1.0 - np.take_along_axis(sims, top, axis=1)
+
+        rows = [self.rows(name, row) for row in top]
+        return {
+            "ids": [[r[0] for r in row] for row in rows],
+            "documents": [[r[1] for r in row] for row in rows],
+            "metadatas": [[r[2] for r in row] for row in rows],
+            "distances": dists.tolist(),
+        }
+
+    def close(self):
+        self.vectors.clear()
+        self._row_index.clear()
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # a caller still holds a view of the vectors; the mapping goes with it
+                pass
+        self._file.close()
+
+
+def load_bundle(path: Path, prefetch: bool = True, warm: bool = True) -> IndexBundle:
+    """
+    Maps a bundle, checks the embedding model and optionally warms it up.
+    """
+    t0 = time.perf_counter()
+    bundle = IndexBundle(path, prefetch=prefetch)
+    if warm:
+        bundle.warm_up()
+
+    counts = ", ".join(f"{n}={m['count']}" for n, m in bundle.manifest["collections"].items())
+    print(f"[INFO] Loaded bundle {path} ({counts}) in {time.perf_counter() - t0:.2f}s")
+    return bundle
+
+
+# -----------------------------------------------------------
+# 3. IMPORT INTO CHROMA
+# -----------------------------------------------------------
+
+def import_bundle(path: Path, batch_size: int = 5000, build_id: Optional[str] = None):
+    """
+    Loads a bundle into local Chroma as new versioned collections and swaps
+    the aliases, exactly like a rebuild — but with no re-embedding.
+    """
+    from .vector_store import _unused_version_name, new_build_id, swap_alias, gc_versions
+
+    bundle = IndexBundle(path, prefetch=True)
+    build_id = build_id or new_build_id()
+
+    try:
+        for name in bundle.collections:
+            meta = bundle.manifest["collections"][name]
+            version_name = _unused_version_name(name, build_id)
+            metadata = meta["hnsw"] or {"hnsw:space": "cosine"}
+            collection = _client.create_collection(name=version_name, metadata=metadata)
+
+            vectors = bundle.vectors[name]
+            for start in range(0, meta["count"], batch_size):
+                end = min(start + batch_size, meta["count"])
+                rows = bundle.rows(name, range(start, end))
+                collection.add(
+                    ids=[r[0] for r in rows],
+                    documents=[r[1] for r in rows],
+                    metadatas=[r[2] or {"source": "unknown"} for r in rows],
+                    embeddings=vectors[start:end].tolist(),
+                )
+
+            if collection.count() != meta["count"]:
+                _client.delete_collection(version_name)
+                raise RuntimeError(f"Imported {collection.count()} items into '{version_name}', "
+                                   f"expected {meta['count']}")
+
+            swap_alias(name, version_name)
+            gc_versions(name)
+            print(f"[SUCCESS] Imported '{name}' ({meta['count']} items) as '{version_name}'.")
+
+        for name, entries in bundle.manifest.get("shards", {}).items():
+            set_shards(name, entries)
+    finally:
+        bundle.close()
@@ -1,10 +1,23 @@
-from typing import List
+import json
+import socket
+import threading
+import time
+from typing import List, Optional
 import requests
 
-from .config import models
+from . import metrics
+from .config import models, deadline_cfg
+from .deadline import Deadline
 from .retrieval import RetrievedDoc
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+
+# returned instead of an answer when the backend fails
+OLLAMA_ERROR = "LLM backend (Ollama) error: could not generate response."
+
+
+def _generate_url() -> str:
+    # read per call so a load test can point it at a stand-in server
+    return f"{models.ollama_url.rstrip('/')}/api/generate"
 
 
 SYSTEM_PROMPT = (
@@ -47,15 +60,27 @@ def build_rag_prompt(query: str, retrieved_docs: List[RetrievedDoc]) -> str:
     return prompt
 
 
-def call_ollama(prompt: str, model_name: str | None = None, temperature: float = 0.2, max_tokens: int = 512) -> str:
+def call_ollama(
+    prompt: str,
+    model_name: str | None = None,
+    temperature: float = 0.2,
+    max_tokens: int = 512,
+    deadline: Optional[Deadline] = None,
+) -> str:
     """
-    Calls local Ollama server's /api/generate endpoint.
-    Assumes Ollama is running on default port (11434).
+    Calls the Ollama server's /api/generate endpoint at models.ollama_url
+    (default: local server on port 11434).
+
+    With a deadline, num_predict is scaled to the time left and the answer
+    is streamed, so generation can be cut off cleanly with partial text.
     """
 
     if model_name is None:
         model_name = models.ollama_model
 
+    if deadline is not None:
+        return _call_ollama_within(prompt, model_name, temperature, max_tokens, deadline)
+
     payload = {
         "model": model_name,
         "prompt": prompt,
@@ -67,25 +92,127 @@ def call_ollama(prompt: str, model_name: str | None = None, temperature: float =
     }
 
     try:
-        resp = requests.post(OLLAMA_URL, json=payload, timeout=120)
+        resp = requests.post(_generate_url(), json=payload, timeout=deadline_cfg.ollama_timeout_s)
         resp.raise_for_status()
     except Exception as e:
         print(f"[ERROR] Ollama call failed: {e}")
-        return "LLM backend (Ollama) error: could not generate response."
+        return OLLAMA_ERROR
 
     data = resp.json()
     return data.get("response", "").strip()
 
 
-def generate_answer(query: str, retrieved_docs: List[RetrievedDoc], temperature: float = 0.2) -> str:
+def _hard_stop(resp: requests.Response):
+    """
+    Ends a streaming response from another thread. Closing it does not wake
+    a read blocked on the socket; shutting the socket down does.
+    """
+    sock = getattr(getattr(resp.raw, "connection", None), "sock", None)
+    if sock is None:
+        # a "Connection: close" response is detached from its connection;
+        # its socket is only reachable through the body's reader
+        reader = getattr(getattr(resp.raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(reader, "raw", None), "_sock", None)
+    if sock is None:
+        resp.close()
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass   # already closed
+
+
+def _call_ollama_within(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    max_tokens: int,
+    deadline: Deadline,
+) -> str:
+    remaining = deadline.remaining()
+    if remaining < deadline_cfg.min_generation_s:
+        metrics.incr("deadline_exceeded.generation")
+        return "Time budget exhausted before generation; see the retrieved context."
+
+    num_predict = max(16, min(max_tokens, int(remaining * deadline_cfg.ollama_tokens_per_s)))
+
+    payload = {
+        "model": model_name,
+        "prompt": prompt,
+        "stream": True,
+        "options": {
+            "temperature": temperature,
+            "num_predict": num_predict,
+        },
+    }
+
+    parts: List[str] = []
+    truncated = False
+    finished = False
+    cut_off = threading.Event()
+
+    def _cut_off(resp: requests.Response):
+        cut_off.set()
+        _hard_stop(resp)
+
+    try:
+        # the read timeout only bounds each read; the timer stops a stream
+        # that stalls mid-answer at the deadline itself
+        with requests.post(_generate_url(), json=payload, stream=True,
+                           timeout=(min(remaining, 5.0), remaining)) as resp:
+            resp.raise_for_status()
+            timer = threading.Timer(max(0.0, deadline.remaining()), _cut_off, args=(resp,))
+            timer.daemon = True
+            timer.start()
+            try:
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    parts.append(chunk.get("response", ""))
+                    if chunk.get("done"):
+                        finished = True
+                        break
+                    if deadline.expired():
+                        truncated = True
+                        break
+            finally:
+                timer.cancel()
+    except Exception as e:
+        if not parts:
+            print(f"[ERROR] Ollama call failed: {e}")
+            if cut_off.is_set() or isinstance(e, requests.exceptions.Timeout):
+                metrics.incr("deadline_exceeded.generation")
+            return OLLAMA_ERROR
+        truncated = True
+
+    # the stream can also just end when the timer shuts the socket
+    truncated = truncated or (cut_off.is_set() and not finished)
+
+    answer = "".join(parts).strip()
+    if truncated:
+        metrics.incr("deadline_exceeded.generation")
+        answer += "\n\n[Answer cut off: time budget reached]"
+    return answer
+
+
+def generate_answer(
+    query: str,
+    retrieved_docs: List[RetrievedDoc],
+    temperature: float = 0.2,
+    deadline: Optional[Deadline] = None,
+) -> str:
     """
     High-level helper:
     - build prompt
-    - call Ollama
+    - call Ollama (within the deadline, if given)
     """
     if not retrieved_docs:
         return "No relevant context retrieved. Please check your data/index."
 
     prompt = build_rag_prompt(query, retrieved_docs)
-    answer = call_ollama(prompt, temperature=temperature)
+
+    t0 = time.perf_counter()
+    answer = call_ollama(prompt, temperature=temperature, deadline=deadline)
+    metrics.observe("generation", time.perf_counter() - t0)
     return answer
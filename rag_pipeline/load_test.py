@@ -0,0 +1,232 @@
+"""
+Concurrent load test of the app's request path: retrieve_uav_docs followed
+by generate_answer, each request under an optional Deadline.
+
+Two modes, swept over a list of levels:
+
+    - closed: level = concurrent technicians, each sending the next query as
+      soon as the previous answer arrives
+    - open:   level = arrival rate (req/s, Poisson arrivals) served by a
+      fixed pool of `concurrency` workers; latency includes queueing
+
+Per level it reports throughput and p50 / p95 / p99 for the whole request,
+the queue wait and every stage recorded in `metrics` (retrieval.embed,
+retrieval.<collection>, retrieval.total, generation, ...). The saturation
+point is the first level where adding load stops adding throughput, the
+p99 exceeds the SLO, or (open mode) completions fall behind arrivals.
+"""
+
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from . import metrics
+from .deadline import Deadline
+from .llm_inference import generate_answer
+from .retrieval import retrieve_uav_docs
+
+
+@dataclass
+class LevelResult:
+    level: float
+    completed: int
+    errors: int
+    elapsed_s: float
+    throughput_rps: float
+    offered_rps: Optional[float]
+    stages: Dict[str, Dict[str, float]]
+    counters: Dict[str, int]
+    backend: Dict[str, int] = field(default_factory=dict)
+    saturated: bool = False
+    reason: str = ""
+
+
+def _one_request(
+    query: str,
+    arrived_at: float,
+    budget_s: Optional[float],
+    aircraft: Optional[str],
+):
+    t_start = time.perf_counter()
+    metrics.observe("queue", t_start - arrived_at)
+
+    # the budget runs from arrival, so time spent queued counts against it
+    deadline = Deadline(max(0.0, budget_s - (t_start - arrived_at))) if budget_s else None
+    try:
+        docs = retrieve_uav_docs(query, deadline=deadline, aircraft=aircraft)
+        answer = generate_answer(query, docs, deadline=deadline)
+        if answer.startswith("LLM backend (Ollama) error"):
+            metrics.incr("load_test.errors")
+    except Exception as e:
+        metrics.incr("load_test.errors")
+        print(f"[ERROR] Request failed: {e}")
+    finally:
+        metrics.observe("request", time.perf_counter() - arrived_at)
+
+
+def _run_closed(queries, users: int, num_requests: int, budget_s, aircraft):
+    query_iter = itertools.cycle(queries)
+    lock = threading.Lock()
+    issued = 0
+
+    def _user():
+        nonlocal issued
+        while True:
+            with lock:
+                if issued >= num_requests:
+                    return
+                issued += 1
+                query = next(query_iter)
+            _one_request(query, time.perf_counter(), budget_s, aircraft)
+
+    threads = [threading.Thread(target=_user, name=f"load-user-{i}") for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def _run_open(queries, rate: float, concurrency: int, num_requests: int, budget_s, aircraft, seed: int) -> float:
+    """
+    Returns the arrival rate actually offered (Poisson sampling makes it
+    differ from `rate` over a short run).
+    """
+    rng = random.Random(seed)
+    query_iter = itertools.cycle(queries)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load-worker") as pool:
+        first_arrival = next_arrival = time.perf_counter()
+        for _ in range(num_requests):
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_one_request, next(query_iter), next_arrival, budget_s, aircraft)
+            next_arrival += rng.expovariate(rate)
+
+    span = next_arrival - first_arrival
+    return num_requests / span if span > 0 else float(rate)
+
+
+def _mark_saturation(
+    results: List[LevelResult],
+    mode: str,
+    min_gain: float,
+    p99_slo_s: Optional[float],
+):
+    best = 0.0
+    for r in results:
+        p99 = r.stages.get("request", {}).get("p99_ms", 0.0) / 1000.0
+        if p99_slo_s is not None and p99 > p99_slo_s:
+            r.saturated, r.reason = True, f"request p99 {p99:.2f}s > SLO {p99_slo_s:.2f}s"
+        elif r.offered_rps is not None and r.throughput_rps < 0.9 * r.offered_rps:
+            r.saturated, r.reason = True, f"served {r.throughput_rps:.2f} of {r.offered_rps:.2f} req/s offered"
+        elif best and r.throughput_rps < best * (1.0 + min_gain):
+            r.saturated, r.reason = True, f"throughput gain < {min_gain:.0%} over best level"
+        best = max(best, r.throughput_rps)
+
+
+def run_load_test(
+    queries: Sequence[str],
+    levels: Sequence[float],
+    mode: str = "closed",
+    requests_per_level: int = 50,
+    concurrency: int = 8,
+    budget_s: Optional[float] = None,
+    aircraft: Optional[str] = None,
+    warmup: int = 2,
+    min_gain: float = 0.10,
+    p99_slo_s: Optional[float] = None,
+    backend=None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Sweeps `levels` (users in closed mode, req/s in open mode) and returns
+    {"levels": [LevelResult as dict], "saturation": {...} or None}.
+    `backend` may be a FakeOllamaServer, whose queue stats are reported.
+    """
+    if mode not in ("closed", "open"):
+        raise ValueError(f"Unknown mode '{mode}' (expected 'closed' or 'open')")
+    if not queries:
+        raise ValueError("No queries to send")
+
+    for query in list(queries)[:warmup]:
+        _one_request(query, time.perf_counter(), budget_s, aircraft)
+
+    results: List[LevelResult] = []
+    for level in levels:
+        metrics.reset()
+        if backend is not None:
+            backend.reset_stats()
+
+        offered = None
+        t0 = time.perf_counter()
+        if mode == "closed":
+            _run_closed(queries, int(level), requests_per_level, budget_s, aircraft)
+        else:
+            offered = _run_open(queries, float(level), concurrency, requests_per_level,
+                                budget_s, aircraft, seed)
+        elapsed = time.perf_counter() - t0
+
+        snap = metrics.snapshot()
+        errors = snap["counters"].get("load_test.errors", 0)
+        completed = requests_per_level - errors
+        result = LevelResult(
+            level=level,
+            completed=completed,
+            errors=errors,
+            elapsed_s=elapsed,
+            throughput_rps=completed / elapsed if elapsed > 0 else 0.0,
+            offered_rps=offered,
+            stages=snap["latency"],
+            counters=snap["counters"],
+            backend=backend.stats() if backend is not None else {},
+        )
+        results.append(result)
+        _print_level(result, mode)
+
+    _mark_saturation(results, mode, min_gain, p99_slo_s)
+
+    saturation = next((r for r in results if r.saturated), None)
+    sustainable = None
+    if saturation is not None:
+        before = results[:results.index(saturation)]
+        sustainable = before[-1].level if before else None
+        print(f"[RESULT] Saturation at {_level_label(saturation.level, mode)}: {saturation.reason}. "
+              f"Highest sustainable level: "
+              f"{_level_label(sustainable, mode) if sustainable is not None else 'none tested'}.")
+    else:
+        print("[RESULT] No saturation within the tested levels; extend the sweep.")
+
+    return {
+        "mode": mode,
+        "levels": [asdict(r) for r in results],
+        "saturation": None if saturation is None else {
+            "level": saturation.level,
+            "reason": saturation.reason,
+            "max_sustainable_level": sustainable,
+        },
+    }
+
+
+def _level_label(level: float, mode: str) -> str:
+    return f"{int(level)} users" if mode == "closed" else f"{level:g} req/s"
+
+
+def _print_level(r: LevelResult, mode: str):
+    def _p(stage: str) -> str:
+        s = r.stages.get(stage)
+        if not s:
+            return "-"
+        return f"{s['p50_ms']:.0f}/{s['p95_ms']:.0f}/{s['p99_ms']:.0f}ms"
+
+    degraded = r.counters.get("retrieval.degraded", 0)
+    cut = r.counters.get("deadline_exceeded.generation", 0)
+    print(f"[LOAD] {_level_label(r.level, mode):>12}: {r.throughput_rps:6.2f} req/s  "
+          f"request={_p('request')}  queue={_p('queue')}  "
+          f"retrieval={_p('retrieval.total')}  generation={_p('generation')}  "
+          f"errors={r.errors} degraded={degraded} cut_off={cut}"
+          + (f"  backend max queue={r.backend.get('max_waiting', 0)}" if r.backend else ""))
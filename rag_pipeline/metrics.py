@@ -0,0 +1,83 @@
+"""
+In-process metrics: stage latencies, counters and gauges.
+
+Thread-safe and dependency-free; snapshot() gives count / p50 / p95 / p99
+per latency series so the app, bulk runs and load tests can report them.
+Latency series keep the most recent `_MAX_SAMPLES` observations.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict
+
+import numpy as np
+
+_MAX_SAMPLES = 10_000
+
+_lock = threading.Lock()
+_latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_MAX_SAMPLES))
+_counters: Dict[str, int] = defaultdict(int)
+_gauges: Dict[str, float] = {}
+_generation = 0   # bumped by reset(), so gauge owners know to re-publish
+
+
+def observe(name: str, seconds: float):
+    with _lock:
+        _latencies[name].append(seconds)
+
+
+def incr(name: str, n: int = 1):
+    with _lock:
+        _counters[name] += n
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+@contextmanager
+def timer(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0)
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    {"latency": {name: {"count", "p50_ms", "p95_ms", "p99_ms"}},
+     "counters": {...}, "gauges": {...}}
+    """
+    with _lock:
+        series = {k: np.asarray(v) for k, v in _latencies.items() if v}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    latency = {}
+    for name, values in sorted(series.items()):
+        ms = values * 1000.0
+        latency[name] = {
+            "count": int(ms.size),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)),
+        }
+
+    return {"latency": latency, "counters": counters, "gauges": gauges}
+
+
+def generation() -> int:
+    return _generation
+
+
+def reset():
+    global _generation
+    with _lock:
+        _generation += 1
+        _latencies.clear()
+        _counters.clear()
+        _gauges.clear()
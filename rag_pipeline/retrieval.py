@@ -1,19 +1,36 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Union
 
-from .vector_store import query_collection
+from . import metrics
+from .deadline import Deadline, remaining_or
+from .embeddings import embed_texts
+from .vector_store import query_collection_batch, get_shards
+from .telemetry_store import get_telemetry_store, parse_threshold_query
 from .config import retrieval_cfg
 
-
 @dataclass
 class RetrievedDoc:
     text: str
     metadata: Dict[str, Any]
     distance: float
-    source_type: str   # "manual" or "telemetry"
+    source_type: str   # "manual", "telemetry" or "telemetry_stats"
     score: float       # fused score (normalized similarity * weight)
 
 
+class RetrievalResults(list):
+    """
+    List[RetrievedDoc] plus deadline bookkeeping: `degraded` is True when
+    some sources were skipped (`skipped` names them) to meet the deadline.
+    """
+
+    def __init__(self, docs=(), degraded: bool = False, skipped: Optional[List[str]] = None):
+        super().__init__(docs)
+        self.degraded = degraded
+        self.skipped = skipped or []
+
+
 def _normalize_distances(distances: List[float]) -> List[float]:
     """
     Chroma returns distances where smaller = closer.
@@ -29,13 +46,22 @@ def _normalize_distances(distances: List[float]) -> List[float]:
     return [1.0 - (d - mn) / (mx - mn) for d in distances]
 
 
-def _extract_results(results: Dict[str, Any], source_type: str, weight: float) -> List[RetrievedDoc]:
-    if not results or not results.get("ids"):
+def _extract_results(
+    results: Dict[str, Any],
+    source_type: str,
+    weight: float,
+    row: int = 0,
+) -> List[RetrievedDoc]:
+    """
+    Converts one query's row of a Chroma result into RetrievedDocs.
+    `row` selects the query when several embeddings were sent at once.
+    """
+    if not results or not results.get("ids") or row >= len(results["ids"]):
         return []
 
-    docs = results["documents"][0]
-    metas = results["metadatas"][0]
-    dists = results["distances"][0]
+    docs = results["documents"][row]
+    metas = results["metadatas"][row]
+    dists = results["distances"][row]
     sims = _normalize_distances(dists)
 
     retrieved: List[RetrievedDoc] = []
@@ -55,18 +81,169 @@ def _extract_results(results: Dict[str, Any], source_type: str, weight: float) -
     return retrieved
 
 
+def _numeric_telemetry_docs(
+    query: str,
+    aircraft: Union[str, Sequence[str], None] = None,
+) -> List[RetrievedDoc]:
+    """
+    Answers threshold questions ("when did ESC temp exceed 80") from the
+    columnar telemetry store instead of the embedding index. Returns at most
+    retrieval_cfg.max_numeric_docs context docs, or [] if the query has no
+    channel/threshold or no store is built. With an aircraft scope only
+    those aircraft's rows are considered, as for the telemetry shards.
+    """
+    try:
+        store = get_telemetry_store()
+    except Exception as e:
+        print(f"[WARN] Telemetry store unavailable: {e}")
+        return []
+    if store is None or retrieval_cfg.max_numeric_docs <= 0:
+        return []
+
+    parsed = parse_threshold_query(query, store.channels())
+    if parsed is None:
+        return []
+
+    channel, op, value = parsed
+    scope = _as_scope(aircraft)
+    events = store.threshold(channel, op, value, aircraft=scope)
+    word = "above" if op == ">" else "below"
+    score = retrieval_cfg.log_weight   # exact matches rank as the best telemetry hit
+
+    def _doc(text: str, meta: Dict[str, Any]) -> RetrievedDoc:
+        return RetrievedDoc(text=text, metadata=meta, distance=0.0,
+                            source_type="telemetry_stats", score=score)
+
+    where = f" for {', '.join(scope)}" if scope else ""
+
+    if not events:
+        stats = store.channel_stats(channel, aircraft=scope)
+        if not stats:
+            return []
+        ranges = "; ".join(
+            f"{src}: min {st['min']:g}, max {st['max']:g}, mean {st['mean']:.3g}"
+            for src, st in stats.items()
+        )
+        return [_doc(
+            f"{channel} was never {word} {value:g} in the telemetry logs{where} as of the store build "
+            f"({store.built_at}; rows appended since are not covered). Observed ranges — {ranges}.",
+            {"source": "telemetry_store", "channel": channel},
+        )]
+
+    sources = sorted({e.source for e in events})
+    summary = _doc(
+        f"{channel} went {word} {value:g}{where} in {len(events)} interval(s) across "
+        f"{len(sources)} log(s): {', '.join(sources)}. "
+        f"Total {sum(e.samples for e in events)} samples (store built {store.built_at}).",
+        {"source": "telemetry_store", "channel": channel},
+    )
+
+    # most extreme intervals first
+    events.sort(key=lambda e: e.peak, reverse=(op == ">"))
+    docs = [summary]
+    for e in events[: retrieval_cfg.max_numeric_docs - 1]:
+        start = store.format_time(e.source, e.start)
+        end = store.format_time(e.source, e.end)
+        docs.append(_doc(
+            f"{e.channel} {word} {value:g} from {start} to {end} "
+            f"({e.samples} samples) in {e.source}{f' ({e.aircraft})' if e.aircraft else ''}; "
+            f"{'peak' if op == '>' else 'lowest'} {e.peak:g}, mean {e.mean:.3g}.",
+            {"source": e.source, "timestamp": start, "channel": e.channel,
+             **({"aircraft": e.aircraft} if e.aircraft else {})},
+        ))
+    return docs
+
+
+def _timed_query(name: str, query_embs, n_results: int):
+    t0 = time.perf_counter()
+    try:
+        return query_collection_batch(name, query_embs, n_results)
+    finally:
+        metrics.observe(f"retrieval.{name}", time.perf_counter() - t0)
+
+
+def _as_scope(scope: Union[str, Sequence[str], None]) -> List[str]:
+    if not scope:
+        return []
+    if isinstance(scope, str):
+        return [scope]
+    return list(scope)
+
+
+def route_collection(name: str, scope: Union[str, Sequence[str], None] = None) -> List[str]:
+    """
+    Collections to query for logical collection `name`.
+
+    - unsharded: [name]
+    - sharded, no scope: every shard (fan-out)
+    - sharded, scope (aircraft ids / model families): only those shards
+    """
+    shards = get_shards(name)
+    if not shards:
+        return [name]
+
+    keys = {k.lower() for k in _as_scope(scope)}
+    if not keys:
+        return [entry["collection"] for entry in shards.values()]
+
+    targets = [entry["collection"] for key, entry in shards.items() if key.lower() in keys]
+    if not targets:
+        print(f"[WARN] No '{name}' shard for {sorted(keys)}; known: {sorted(shards)}")
+    return targets
+
+
+def _merge_shard_results(results: List[Optional[Dict[str, Any]]], n_results: int) -> Optional[Dict[str, Any]]:
+    """
+    Merges per-shard Chroma results into one result with the global top
+    n_results per query row, by raw distance (all shards share one
+    embedding space, so distances are comparable).
+    """
+    results = [r for r in results if r and r.get("ids")]
+    if not results:
+        return None
+    if len(results) == 1:
+        return results[0]
+
+    merged: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+    for row in range(len(results[0]["ids"])):
+        candidates = []
+        for r in results:
+            candidates.extend(zip(
+                r["distances"][row], r["ids"][row], r["documents"][row], r["metadatas"][row],
+            ))
+        candidates.sort(key=lambda c: c[0])
+        candidates = candidates[:n_results]
+
+        merged["distances"].append([c[0] for c in candidates])
+        merged["ids"].append([c[1] for c in candidates])
+        merged["documents"].append([c[2] for c in candidates])
+        merged["metadatas"].append([c[3] for c in candidates])
+    return merged
+
+
 def retrieve_uav_docs(
     query: str,
     top_k_manual: Optional[int] = None,
     top_k_telemetry: Optional[int] = None,
-) -> List[RetrievedDoc]:
+    deadline: Optional[Deadline] = None,
+    aircraft: Union[str, Sequence[str], None] = None,
+    model_family: Union[str, Sequence[str], None] = None,
+) -> RetrievalResults:
     """
     Main retrieval entry point for AeroSense RAG.
 
-    - queries manuals and telemetry independently
+    - embeds the query once
+    - queries manuals and telemetry concurrently; sharded collections are
+      routed to the shards in scope (aircraft / model_family) or fanned out
+      across all shards and merged to top_k
     - normalizes their scores
     - fuses them with weights
     - returns globally ranked top_k
+    - threshold questions get exact interval docs from the telemetry
+      store first ("telemetry_stats"), followed by the fused results
+
+    With a deadline, sources (or shards) that have not answered when it
+    expires are skipped and the results are marked degraded.
     """
 
     if top_k_manual is None:
@@ -74,35 +251,131 @@ def retrieve_uav_docs(
     if top_k_telemetry is None:
         top_k_telemetry = retrieval_cfg.top_k
 
-    # 1) manual retrieval
-    try:
-        manual_res = query_collection("manual_chunks", query, top_k_manual)
-    except Exception as e:
-        print(f"[WARN] manual_chunks retrieval failed: {e}")
-        manual_res = None
+    t_start = time.perf_counter()
+    skipped: List[str] = []
 
-    manual_docs = _extract_results(
-        manual_res,
-        source_type="manual",
-        weight=retrieval_cfg.manual_weight,
-    )
+    with metrics.timer("retrieval.embed"):
+        query_embs = embed_texts([query])
+    if deadline is not None and deadline.expired():
+        metrics.incr("deadline_exceeded.retrieval.embed")
 
-    # 2) telemetry retrieval
-    try:
-        telem_res = query_collection("telemetry_records", query, top_k_telemetry)
-    except Exception as e:
-        print(f"[WARN] telemetry_records retrieval failed: {e}")
-        telem_res = None
+    # 1) manual + telemetry retrieval, every target collection in parallel
+    sources = [
+        ("manual_chunks", "manual", top_k_manual, retrieval_cfg.manual_weight, model_family),
+        ("telemetry_records", "telemetry", top_k_telemetry, retrieval_cfg.log_weight, aircraft),
+    ]
+    targets = {name: route_collection(name, scope) for name, _, _, _, scope in sources}
 
-    telem_docs = _extract_results(
-        telem_res,
-        source_type="telemetry",
-        weight=retrieval_cfg.log_weight,
+    # One pool per request, sized to its fan-out: a query abandoned at the
+    # deadline keeps only this request's thread busy, never another
+    # request's fast sources. Routing can find no target at all (no shard
+    # in scope), hence the floor of one.
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, sum(len(t) for t in targets.values())), thread_name_prefix="retrieval",
     )
+    docs_by_source: Dict[str, List[RetrievedDoc]] = {}
+    try:
+        futures = {
+            name: [(target, executor.submit(_timed_query, target, query_embs, k))
+                   for target in targets[name]]
+            for name, _, k, _, _ in sources
+        }
+
+        for name, source_type, k, weight, _ in sources:
+            shard_results = []
+            for target, fut in futures[name]:
+                try:
+                    shard_results.append(fut.result(timeout=remaining_or(deadline, None)))
+                except FuturesTimeout:
+                    fut.cancel()
+                    skipped.append(target)
+                    metrics.incr(f"deadline_exceeded.retrieval.{target}")
+                    print(f"[WARN] {target} retrieval skipped: deadline reached")
+                except Exception as e:
+                    print(f"[WARN] {target} retrieval failed: {e}")
+
+            res = _merge_shard_results(shard_results, k)
+            docs_by_source[source_type] = _extract_results(res, source_type=source_type, weight=weight)
+    finally:
+        # don't wait for abandoned queries; they finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    # 3) fuse & sort
+    # 2) exact numeric matches from the telemetry store
+    if deadline is not None and deadline.expired():
+        skipped.append("telemetry_store")
+        metrics.incr("deadline_exceeded.retrieval.telemetry_store")
+        numeric_docs = []
+    else:
+        with metrics.timer("retrieval.telemetry_store"):
+            numeric_docs = _numeric_telemetry_docs(query, aircraft)
+
+    # 3) fuse, sort, keep global top_k
+    fused = _fuse(docs_by_source["manual"], docs_by_source["telemetry"], numeric_docs)
+    metrics.observe("retrieval.total", time.perf_counter() - t_start)
+
+    if skipped:
+        metrics.incr("retrieval.degraded")
+    return RetrievalResults(fused, degraded=bool(skipped), skipped=skipped)
+
+
+def _fuse(
+    manual_docs: List[RetrievedDoc],
+    telem_docs: List[RetrievedDoc],
+    numeric_docs: Optional[List[RetrievedDoc]] = None,
+) -> List[RetrievedDoc]:
+    numeric_docs = numeric_docs or []
     all_docs: List[RetrievedDoc] = manual_docs + telem_docs
     all_docs.sort(key=lambda d: d.score, reverse=True)
+    return numeric_docs + all_docs[: max(0, retrieval_cfg.top_k - len(numeric_docs))]
+
+
+def retrieve_uav_docs_batch(
+    queries: List[str],
+    top_k_manual: Optional[int] = None,
+    top_k_telemetry: Optional[int] = None,
+    aircraft: Union[str, Sequence[str], None] = None,
+    model_family: Union[str, Sequence[str], None] = None,
+) -> List[List[RetrievedDoc]]:
+    """
+    Batch version of retrieve_uav_docs for bulk diagnosis runs.
+
+    - embeds all queries in one pass
+    - sends every query vector to each collection (or routed shard)
+      in a single call
+    - fuses per query exactly like retrieve_uav_docs
+
+    Returns one ranked list per query, in input order.
+    """
+    if not queries:
+        return []
+
+    if top_k_manual is None:
+        top_k_manual = retrieval_cfg.top_k
+    if top_k_telemetry is None:
+        top_k_telemetry = retrieval_cfg.top_k
+
+    query_embs = embed_texts(queries)
+
+    def _query_all(name: str, scope, k: int):
+        shard_results = []
+        for target in route_collection(name, scope):
+            try:
+                shard_results.append(_timed_query(target, query_embs, k))
+            except Exception as e:
+                print(f"[WARN] {target} batch retrieval failed: {e}")
+        return _merge_shard_results(shard_results, k)
+
+    manual_res = _query_all("manual_chunks", model_family, top_k_manual)
+    telem_res = _query_all("telemetry_records", aircraft, top_k_telemetry)
+
+    out: List[List[RetrievedDoc]] = []
+    for row in range(len(queries)):
+        manual_docs = _extract_results(
+            manual_res, source_type="manual", weight=retrieval_cfg.manual_weight, row=row,
+        )
+        telem_docs = _extract_results(
+            telem_res, source_type="telemetry", weight=retrieval_cfg.log_weight, row=row,
+        )
+        out.append(_fuse(manual_docs, telem_docs, _numeric_telemetry_docs(queries[row], aircraft)))
 
-    # 4) keep only global top_k
-    return all_docs[: retrieval_cfg.top_k]
+    return out
@@ -0,0 +1,66 @@
+"""
+Shard keys and names for per-aircraft / per-model-family collections.
+
+Telemetry chunks are keyed by aircraft: the "aircraft" metadata picked up
+from an aircraft/tail column at ingestion, else sharding_cfg.aircraft_by_source
+(glob on the log filename), else the log's file stem. Manual chunks are keyed
+by model family via sharding_cfg.family_by_source.
+
+A shard of logical collection "telemetry_records" for aircraft "AC-12" is the
+logical collection "telemetry_records-ac-12-<hash>"; it is versioned and aliased
+like any other collection (see vector_store.build_collection).
+"""
+
+import fnmatch
+import hashlib
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import sharding_cfg
+
+# Chroma names are at most 63 chars; leave room for "<name>-" and "__<build_id>".
+_MAX_SLUG = 24
+_HASH_LEN = 6
+
+
+def _slug(key: str) -> str:
+    """
+    Readable, name-safe form of `key` plus a short hash of the exact key,
+    so keys that normalize alike ("AC-12", "ac_12") get distinct shards.
+    """
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:_HASH_LEN]
+    slug = re.sub(r"[^a-z0-9]+", "-", key.lower()).strip("-") or "x"
+    slug = slug[: _MAX_SLUG - _HASH_LEN - 1].rstrip("-") or "x"
+    return f"{slug}-{digest}"
+
+
+def shard_collection_name(name: str, key: str) -> str:
+    return f"{name}-{_slug(key)}"
+
+
+def shard_parent(name: str, candidates) -> Optional[str]:
+    """
+    The logical collection among `candidates` that `name` is a shard of, if any.
+    """
+    parents = [c for c in candidates if name.startswith(c + "-")]
+    return max(parents, key=len) if parents else None
+
+
+def _match_source(source: str, mapping: Dict[str, str]):
+    for pattern, value in mapping.items():
+        if fnmatch.fnmatch(source, pattern):
+            return value
+    return None
+
+
+def telemetry_shard_key(metadata: Dict[str, Any]) -> str:
+    if metadata.get("aircraft"):
+        return str(metadata["aircraft"])
+    source = str(metadata.get("source", "unknown"))
+    return _match_source(source, sharding_cfg.aircraft_by_source) or Path(source).stem
+
+
+def manual_shard_key(metadata: Dict[str, Any]) -> str:
+    source = str(metadata.get("source", "unknown"))
+    return _match_source(source, sharding_cfg.family_by_source) or sharding_cfg.default_family
@@ -0,0 +1,486 @@
+"""
+Columnar numeric telemetry store.
+
+The vector index keeps telemetry as "AccX: 0.12, ESC_temp: 83" strings,
+which is fine for fuzzy matching but useless for questions like
+"when did ESC temp exceed 80 °C". This module keeps the numbers:
+
+    telemetry_store/
+        index.json                  # {source_name: directory, ...}, written last
+        <csv stem>/
+            manifest.json           # source, rows, channels, timestamp kind, shard keys
+            timestamp.npy           # float64 seconds (or row index)
+            shard_key.npy           # int32 index into shard_keys per row (multi-aircraft logs only)
+            ch_000.npy, ch_001.npy  # one float64 array per numeric channel
+
+Arrays are opened with np.load(mmap_mode="r"), so queries only page in the
+channels they touch. Range, threshold and rolling-statistic queries are
+vectorized NumPy over whole channels.
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import paths
+from .data_ingestion import AIRCRAFT_KEYS, TIMESTAMP_KEYS
+from .sharding import telemetry_shard_key
+
+
+@dataclass
+class TelemetryEvent:
+    source: str
+    channel: str
+    op: str
+    threshold: float
+    start: float          # timestamp of first matching sample
+    end: float            # timestamp of last matching sample
+    samples: int
+    peak: float           # max for ">" queries, min for "<" queries
+    mean: float
+    aircraft: Optional[str] = None   # set for logs with several aircraft
+
+
+# -----------------------------------------------------------
+# 1. BUILD
+# -----------------------------------------------------------
+
+def _timestamps(df: pd.DataFrame) -> Tuple[np.ndarray, str, Optional[str]]:
+    """
+    Returns (seconds, kind, column). kind is "seconds" for numeric
+    timestamp columns, "datetime" for parsed date strings (epoch seconds),
+    "row" when no timestamp column exists.
+    """
+    for col in df.columns:
+        if str(col).strip().lower() not in TIMESTAMP_KEYS:
+            continue
+
+        numeric = pd.to_numeric(df[col], errors="coerce")
+        if numeric.notna().mean() > 0.9:
+            return numeric.to_numpy(dtype=np.float64), "seconds", col
+
+        parsed = pd.to_datetime(df[col], errors="coerce", utc=True)
+        if parsed.notna().mean() > 0.9:
+            secs = (parsed - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+            return secs.to_numpy(dtype=np.float64), "datetime", col
+
+    return np.arange(len(df), dtype=np.float64), "row", None
+
+
+def _row_shard_keys(df: pd.DataFrame, source: str) -> Tuple[np.ndarray, List[str]]:
+    """
+    Per-row shard key, as ingestion assigns it to telemetry chunks: the
+    last non-empty aircraft column, else the key derived from the file.
+    Returns (codes, keys) with keys[codes[i]] the key of row i.
+    """
+    aircraft = pd.Series([""] * len(df), index=df.index, dtype=object)
+    for col in df.columns:
+        if str(col).strip().lower() in AIRCRAFT_KEYS:
+            values = df[col].fillna("").astype(str).str.strip()
+            aircraft = aircraft.where(values == "", values)
+
+    fallback = telemetry_shard_key({"source": source})
+    keys = aircraft.where(aircraft != "", fallback)
+    codes, uniques = pd.factorize(keys)
+    return codes.astype(np.int32), [str(k) for k in uniques]
+
+
+def _write_source(csv_path: Path, out_dir: Path) -> Optional[Dict[str, Any]]:
+    df = pd.read_csv(csv_path, encoding="utf-8", encoding_errors="ignore", on_bad_lines="warn")
+    df.columns = [str(c).strip() for c in df.columns]
+    if df.empty:
+        return None
+
+    ts, ts_kind, ts_col = _timestamps(df)
+
+    # logs are normally time-ordered; searchsorted-based range queries need it
+    order = None
+    if ts_kind != "row" and not np.all(np.diff(ts[~np.isnan(ts)]) >= 0):
+        order = np.argsort(ts, kind="stable")
+        ts = ts[order]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    np.save(out_dir / "timestamp.npy", ts)
+
+    key_codes, shard_keys = _row_shard_keys(df, csv_path.name)
+    if len(shard_keys) > 1:
+        np.save(out_dir / "shard_key.npy", key_codes if order is None else key_codes[order])
+
+    channels = []
+    for col in df.columns:
+        if col == ts_col:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+        if np.isnan(values).all():
+            continue
+        if order is not None:
+            values = values[order]
+
+        fname = f"ch_{len(channels):03d}.npy"
+        np.save(out_dir / fname, values)
+        channels.append({"name": col, "file": fname})
+
+    manifest = {
+        "source": csv_path.name,
+        "rows": int(len(df)),
+        "timestamp_kind": ts_kind,
+        "shard_keys": shard_keys,
+        "channels": channels,
+    }
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def build_telemetry_store(store_dir: Optional[Path] = None) -> Dict[str, str]:
+    """
+    Converts every CSV in data/logs/ into per-channel NumPy arrays.
+    The new store is assembled next to the old one and renamed into place.
+    """
+    if store_dir is None:
+        store_dir = paths.telemetry_store_dir
+
+    tmp_dir = store_dir.with_name(store_dir.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    index: Dict[str, str] = {}
+    for csv_path in sorted(paths.logs_dir.glob("*.csv")):
+        try:
+            manifest = _write_source(csv_path, tmp_dir / csv_path.stem)
+        except Exception as e:
+            print(f"[ERROR] Failed to columnize {csv_path}: {e}")
+            continue
+        if manifest is None:
+            print(f"[WARN] Telemetry CSV empty: {csv_path.name}")
+            continue
+        index[csv_path.name] = csv_path.stem
+        print(f"[INFO] Columnized {csv_path.name}: {manifest['rows']} rows, "
+              f"{len(manifest['channels'])} channels ({manifest['timestamp_kind']} timestamps)")
+
+    (tmp_dir / "index.json").write_text(json.dumps(index, indent=2), encoding="utf-8")
+
+    old_dir = store_dir.with_name(store_dir.name + f".old{os.getpid()}")
+    if store_dir.exists():
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(f"[SUCCESS] Telemetry store built with {len(index)} sources at {store_dir}")
+    return index
+
+
+# -----------------------------------------------------------
+# 2. QUERY ENGINE
+# -----------------------------------------------------------
+
+def normalize_channel(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+class TelemetryStore:
+    """
+    Read-only, memory-mapped view over a built store.
+    """
+
+    def __init__(self, store_dir: Optional[Path] = None):
+        self.store_dir = store_dir or paths.telemetry_store_dir
+        self.manifests: Dict[str, Dict[str, Any]] = {}
+        self._arrays: Dict[Tuple[str, str], np.ndarray] = {}
+
+        index_path = self.store_dir / "index.json"
+        self.mtime = index_path.stat().st_mtime_ns
+        # rebuilt only by build_index (tail mode does not update it)
+        self.built_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.mtime / 1e9))
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+
+        for source, subdir in index.items():
+            manifest = json.loads((self.store_dir / subdir / "manifest.json").read_text(encoding="utf-8"))
+            manifest["dir"] = subdir
+            manifest["by_norm"] = {normalize_channel(c["name"]): c for c in manifest["channels"]}
+            self.manifests[source] = manifest
+
+    # ----- low level -----
+
+    def _load(self, source: str, fname: str) -> np.ndarray:
+        key = (source, fname)
+        if key not in self._arrays:
+            path = self.store_dir / self.manifests[source]["dir"] / fname
+            self._arrays[key] = np.load(path, mmap_mode="r")
+        return self._arrays[key]
+
+    def channels(self) -> List[str]:
+        names = {c["name"] for m in self.manifests.values() for c in m["channels"]}
+        return sorted(names)
+
+    def timestamp_kind(self, source: str) -> str:
+        return self.manifests[source]["timestamp_kind"]
+
+    def _scope_mask(self, source: str, aircraft: Sequence[str]) -> Optional[np.ndarray]:
+        """
+        Rows of `source` whose shard key is in `aircraft` (case-insensitive):
+        None when all rows match, an all-False mask when none do.
+        """
+        manifest = self.manifests[source]
+        # stores built before shard keys were recorded: key by file, like ingestion
+        keys = manifest.get("shard_keys") or [telemetry_shard_key({"source": source})]
+        wanted = {a.lower() for a in aircraft}
+        hit = np.array([k.lower() in wanted for k in keys])
+
+        if hit.all():
+            return None
+        if not hit.any() or len(keys) == 1:
+            return np.zeros(manifest["rows"], dtype=bool)
+        return hit[np.asarray(self._load(source, "shard_key.npy"))]
+
+    def _key_rows(self, source: str, aircraft: Optional[Sequence[str]]) -> List[Tuple[Optional[str], Optional[np.ndarray]]]:
+        """
+        [(shard key, row indices), ...] for a log with several aircraft
+        (only keys in `aircraft`, if given), [(None, None)] meaning all
+        rows otherwise.
+        """
+        keys = self.manifests[source].get("shard_keys") or []
+        if len(keys) < 2:
+            return [(None, None)]
+
+        codes = np.asarray(self._load(source, "shard_key.npy"))
+        wanted = {a.lower() for a in aircraft} if aircraft else None
+        return [
+            (key, np.flatnonzero(codes == i))
+            for i, key in enumerate(keys)
+            if wanted is None or key.lower() in wanted
+        ]
+
+    def _series(self, channel: str, source: Optional[str] = None, aircraft: Optional[Sequence[str]] = None):
+        """
+        Yields (source, channel_name, timestamps, values) for each source
+        that has `channel` (matched case/punctuation-insensitively). With
+        `aircraft`, only those aircraft's rows are kept (others become NaN).
+        """
+        norm = normalize_channel(channel)
+        sources = [source] if source else list(self.manifests)
+        for src in sources:
+            ch = self.manifests.get(src, {}).get("by_norm", {}).get(norm)
+            if ch is None:
+                continue
+
+            values = self._load(src, ch["file"])
+            if aircraft:
+                mask = self._scope_mask(src, aircraft)
+                if mask is not None:
+                    if not mask.any():
+                        continue
+                    values = np.where(mask, values, np.nan)
+            yield src, ch["name"], self._load(src, "timestamp.npy"), values
+
+    # ----- queries -----
+
+    def threshold(
+        self,
+        channel: str,
+        op: str,
+        value: float,
+        source: Optional[str] = None,
+        min_samples: int = 1,
+        aircraft: Optional[Sequence[str]] = None,
+    ) -> List[TelemetryEvent]:
+        """
+        Contiguous intervals where `channel op value` holds (op is ">" or "<"),
+        optionally limited to the given aircraft (shard keys). In a log with
+        several aircraft, intervals are found per aircraft, so samples from
+        different airframes are never joined into one interval.
+        """
+        events: List[TelemetryEvent] = []
+
+        for src, name, ts, vals in self._series(channel, source, aircraft):
+            ts, vals = np.asarray(ts), np.asarray(vals)
+            for key, rows in self._key_rows(src, aircraft):
+                k_ts, k_vals = (ts, vals) if rows is None else (ts[rows], vals[rows])
+                with np.errstate(invalid="ignore"):
+                    mask = k_vals > value if op == ">" else k_vals < value
+                if not mask.any():
+                    continue
+
+                edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+                starts = np.flatnonzero(edges == 1)
+                ends = np.flatnonzero(edges == -1)          # exclusive
+                lengths = ends - starts
+
+                # gaps are filled so reduceat over [start_i, start_i+1) only sees run i
+                if op == ">":
+                    peaks = np.maximum.reduceat(np.where(mask, k_vals, -np.inf), starts)
+                else:
+                    peaks = np.minimum.reduceat(np.where(mask, k_vals, np.inf), starts)
+                means = np.add.reduceat(np.where(mask, k_vals, 0.0), starts) / lengths
+
+                keep = lengths >= min_samples
+                for s, e, n, pk, mn in zip(starts[keep], ends[keep], lengths[keep], peaks[keep], means[keep]):
+                    events.append(TelemetryEvent(
+                        source=src, channel=name, op=op, threshold=value,
+                        start=float(k_ts[s]), end=float(k_ts[e - 1]), samples=int(n),
+                        peak=float(pk), mean=float(mn), aircraft=key,
+                    ))
+
+        return events
+
+    def range_stats(
+        self,
+        channel: str,
+        start: float,
+        end: float,
+        source: Optional[str] = None,
+        aircraft: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        min / max / mean / std / count of `channel` for start <= t <= end, per source.
+        """
+        out: Dict[str, Dict[str, float]] = {}
+        for src, name, ts, vals in self._series(channel, source, aircraft):
+            lo = np.searchsorted(ts, start, side="left")
+            hi = np.searchsorted(ts, end, side="right")
+            window = np.asarray(vals[lo:hi])
+            window = window[~np.isnan(window)]
+            if window.size == 0:
+                continue
+            out[src] = {
+                "channel": name,
+                "min": float(window.min()),
+                "max": float(window.max()),
+                "mean": float(window.mean()),
+                "std": float(window.std()),
+                "count": int(window.size),
+            }
+        return out
+
+    def rolling(
+        self,
+        channel: str,
+        window: int,
+        stat: str = "mean",
+        source: Optional[str] = None,
+        aircraft: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Rolling mean / std / max / min over `window` samples, per source.
+        Returns {source: (timestamps_at_window_end, values)}.
+        NaN samples are skipped: each window's statistic covers only its
+        valid samples, and is NaN when it has none.
+        """
+        out: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for src, _, ts, vals in self._series(channel, source, aircraft):
+            vals = np.asarray(vals)
+            if vals.size < window:
+                continue
+
+            if stat in ("mean", "std"):
+                valid = ~np.isnan(vals)
+                x = np.where(valid, vals, 0.0)
+                cn = np.concatenate(([0], np.cumsum(valid)))
+                n = (cn[window:] - cn[:-window]).astype(np.float64)
+                n[n == 0] = np.nan
+                c1 = np.concatenate(([0.0], np.cumsum(x)))
+                mean = (c1[window:] - c1[:-window]) / n
+                if stat == "mean":
+                    res = mean
+                else:
+                    c2 = np.concatenate(([0.0], np.cumsum(x * x)))
+                    var = (c2[window:] - c2[:-window]) / n - mean ** 2
+                    res = np.sqrt(np.maximum(var, 0.0))
+            elif stat in ("max", "min"):
+                view = np.lib.stride_tricks.sliding_window_view(vals, window)
+                res = np.nanmax(view, axis=1) if stat == "max" else np.nanmin(view, axis=1)
+            else:
+                raise ValueError(f"Unsupported rolling stat: {stat}")
+
+            out[src] = (np.asarray(ts[window - 1:]), res)
+        return out
+
+    def channel_stats(
+        self,
+        channel: str,
+        source: Optional[str] = None,
+        aircraft: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Dict[str, float]]:
+        return self.range_stats(channel, -np.inf, np.inf, source=source, aircraft=aircraft)
+
+    def format_time(self, source: str, t: float) -> str:
+        kind = self.timestamp_kind(source)
+        if kind == "datetime":
+            return pd.Timestamp(t, unit="s", tz="UTC").isoformat()
+        if kind == "row":
+            return f"row {int(t)}"
+        return f"t={t:g}s"
+
+
+_store: Optional[TelemetryStore] = None
+
+
+def get_telemetry_store() -> Optional[TelemetryStore]:
+    """
+    Shared store instance; reopened when a rebuild replaces index.json.
+    Returns None if no store has been built.
+    """
+    global _store
+    try:
+        mtime = (paths.telemetry_store_dir / "index.json").stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    if _store is None or _store.mtime != mtime:
+        _store = TelemetryStore()
+    return _store
+
+
+# -----------------------------------------------------------
+# 3. NATURAL-LANGUAGE THRESHOLD QUERIES
+# -----------------------------------------------------------
+
+_OP_PATTERN = re.compile(
+    r"(exceed(?:s|ed|ing)?|above|over|greater than|more than|higher than|>=?"
+    r"|below|under|less than|lower than|drop(?:s|ped)? (?:below|under)|<=?)"
+    r"\s*(-?\d+(?:\.\d+)?)"
+    # "over 40 seconds", "more than 3 flights": durations and counts, not thresholds
+    r"(?!\d|\.\d|\s*(?:ms|s|secs?|seconds?|mins?|minutes?|h|hrs?|hours?|days?"
+    r"|times|samples|rows|flights|logs|cycles|sorties)\b)",
+    re.IGNORECASE,
+)
+
+
+def parse_threshold_query(query: str, channels: List[str]) -> Optional[Tuple[str, str, float]]:
+    """
+    Finds "<channel> ... exceeds|above|below|< <number>" in a question.
+    Returns (channel, op, value) or None. The channel is the longest known
+    channel name contained in the query, ignoring case and punctuation
+    ("ESC temp" matches "ESC_temp"); names shorter than 3 characters
+    must appear as a whole word.
+    """
+    m = _OP_PATTERN.search(query)
+    if not m:
+        return None
+
+    word = m.group(1).lower()
+    op = "<" if word.startswith(("below", "under", "less", "lower", "drop", "<")) else ">"
+    value = float(m.group(2))
+
+    q_norm = normalize_channel(query.replace("temperature", "temp"))
+    q_words = {normalize_channel(w) for w in re.split(r"\W+", query)}
+
+    best = None
+    for ch in channels:
+        norm = normalize_channel(ch)
+        if not norm:
+            continue
+        hit = norm in q_words if len(norm) < 3 else norm in q_norm
+        if hit and (best is None or len(norm) > len(normalize_channel(best))):
+            best = ch
+
+    if best is None:
+        return None
+    return best, op, value
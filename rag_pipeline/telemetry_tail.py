@@ -0,0 +1,297 @@
+"""
+Live tail ingestion for telemetry logs that are still being written.
+
+Tracks a byte offset per CSV in data/logs/, parses only rows appended since
+the last poll, and upserts them into the live telemetry collection in small
+batches. Work per poll depends on how much was appended, not on file size.
+
+State (offset, inode, header) is persisted to paths.tail_state_file when a
+file is first seen and after each successful upsert, so a restarted tailer
+resumes where it stopped. Row IDs are derived from (inode, byte offset)
+only, so re-reading a range after a crash, or a rotated file picked up
+again under a new name, just overwrites the same points.
+
+A rebuild swaps in a new version that only has the rows build_index.py
+read; anything tailed into the outgoing version after that is not in it.
+build_index.py publishes its read offsets (paths.build_offsets_file) once
+the new version is live, and the tailer moves each file back to them.
+"""
+
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import paths, tail_cfg
+from .data_ingestion import _format_telemetry_row
+from .sharding import telemetry_shard_key
+from .vector_store import get_shards, register_shard, upsert_docs
+
+TELEMETRY_COLLECTION = "telemetry_records"
+
+
+@dataclass
+class FileTailState:
+    inode: int
+    offset: int          # byte offset of the first row not yet ingested
+    header: List[str]    # column names; empty until the header line is complete
+    build_id: str = ""   # last rebuild whose read offset this entry was moved to
+
+
+@dataclass
+class PollStats:
+    rows: int = 0
+    files: int = 0
+    max_lag_s: float = 0.0     # time from last write to rows being searchable
+    backlog_bytes: int = 0     # bytes appended but not yet ingested
+
+
+def load_state() -> Dict[str, FileTailState]:
+    try:
+        raw = json.loads(paths.tail_state_file.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[WARN] Cannot read tail state {paths.tail_state_file}: {e}. Starting fresh.")
+        return {}
+    return {name: FileTailState(**entry) for name, entry in raw.items()}
+
+
+def save_state(state: Dict[str, FileTailState]):
+    paths.tail_state_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = paths.tail_state_file.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps({k: asdict(v) for k, v in state.items()}, indent=2), encoding="utf-8")
+    os.replace(tmp, paths.tail_state_file)
+
+
+_build_cache: Dict[str, Any] = {"mtime": None}
+
+
+def _sync_with_build(state: Dict[str, FileTailState]) -> int:
+    """
+    Moves each file to the offset the latest live rebuild read it up to
+    (once per rebuild), so rows tailed into the outgoing version while it
+    was being built are ingested again into the new one. Returns the
+    number of files moved.
+    """
+    try:
+        mtime = os.stat(paths.build_offsets_file).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+    if mtime == _build_cache["mtime"]:
+        return 0
+
+    try:
+        build = json.loads(paths.build_offsets_file.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[WARN] Cannot read build offsets {paths.build_offsets_file}: {e}")
+        return 0
+    _build_cache["mtime"] = mtime
+
+    build_id = build["build_id"]
+    moved = 0
+    for name, read in build["files"].items():
+        entry = state.get(name)
+        if entry is not None and entry.build_id == build_id:
+            continue
+        if entry is None or entry.inode == read["inode"]:
+            # same file: the build has everything before read["offset"], nothing after
+            state[name] = FileTailState(**read, build_id=build_id)
+            moved += 1
+        else:
+            entry.build_id = build_id   # rotated since the build read it
+
+    if moved:
+        save_state(state)
+        print(f"[INFO] Build {build_id} is live — resuming {moved} file(s) from where it read them")
+    return moved
+
+
+def _parse_header(line: bytes) -> List[str]:
+    text = line.decode("utf-8", errors="ignore")
+    return next(csv.reader([text]), [])
+
+
+def _read_appended(csv_path: Path, entry: FileTailState, size: int) -> Tuple[List[Tuple[int, bytes]], int]:
+    """
+    Reads complete lines between entry.offset and size (capped at
+    tail_cfg.max_read_bytes). A trailing partial line is left for the next poll.
+    Returns ([(line_offset, line_bytes), ...], new_offset).
+    """
+    with csv_path.open("rb") as f:
+        f.seek(entry.offset)
+        data = f.read(min(size - entry.offset, tail_cfg.max_read_bytes))
+
+    complete = data.rfind(b"\n") + 1
+    if complete == 0:
+        return [], entry.offset
+
+    lines = []
+    pos = entry.offset
+    for line in data[:complete].splitlines(keepends=True):
+        lines.append((pos, line))
+        pos += len(line)
+
+    return lines, entry.offset + complete
+
+
+def _rows_from_lines(
+    csv_path: Path,
+    entry: FileTailState,
+    lines: List[Tuple[int, bytes]],
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Turns raw appended lines into (id, record) pairs, consuming the header
+    line first if this file is being read from the start.
+    """
+    if not entry.header and lines:
+        entry.header = _parse_header(lines[0][1])
+        lines = lines[1:]
+
+    out = []
+    for offset, line in lines:
+        text = line.decode("utf-8", errors="ignore")
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]), [])
+        row = dict(zip(entry.header, values))
+        record = _format_telemetry_row(row, csv_path.name)
+        if record is None:
+            continue
+
+        doc_id = f"telemetry_tail_{entry.inode}_{offset}"
+        out.append((doc_id, record))
+
+    return out
+
+
+def _group_by_collection(
+    rows: List[Tuple[str, Dict[str, Any]]],
+) -> Dict[str, List[Tuple[str, Dict[str, Any]]]]:
+    """
+    Target collection per row: the aircraft's shard when telemetry is
+    sharded (new aircraft get a new shard), else the global collection.
+    """
+    if not get_shards(TELEMETRY_COLLECTION):
+        return {TELEMETRY_COLLECTION: rows}
+
+    groups: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    for doc_id, record in rows:
+        key = telemetry_shard_key(record["metadata"])
+        groups.setdefault(register_shard(TELEMETRY_COLLECTION, key), []).append((doc_id, record))
+    return groups
+
+
+def poll_once(state: Dict[str, FileTailState], from_start: bool = False) -> PollStats:
+    """
+    One scan of logs_dir. Files not yet in `state` start at their current
+    end unless from_start is set; run_tail only leaves it unset for the
+    very first scan with no saved state, when build_index.py has already
+    covered existing rows. Rotated or truncated files restart from byte 0.
+    """
+    stats = PollStats()
+
+    for csv_path in sorted(paths.logs_dir.glob("*.csv")):
+        try:
+            st = csv_path.stat()
+        except FileNotFoundError:
+            continue
+
+        entry = state.get(csv_path.name)
+
+        if entry is None:
+            entry = FileTailState(inode=st.st_ino, offset=0, header=[])
+            if not from_start and st.st_size > 0:
+                with csv_path.open("rb") as f:
+                    header_line = f.readline()
+                if header_line.endswith(b"\n"):
+                    entry.header = _parse_header(header_line)
+                    entry.offset = st.st_size
+            state[csv_path.name] = entry
+            save_state(state)   # rows appended while we are down must not be skipped
+            print(f"[INFO] Tailing {csv_path.name} from byte {entry.offset}")
+
+        elif st.st_ino != entry.inode or st.st_size < entry.offset:
+            print(f"[INFO] {csv_path.name} was rotated/truncated — restarting from byte 0")
+            entry = FileTailState(inode=st.st_ino, offset=0, header=[])
+            state[csv_path.name] = entry
+            save_state(state)
+
+        if st.st_size <= entry.offset:
+            continue
+
+        lines, new_offset = _read_appended(csv_path, entry, st.st_size)
+        rows = _rows_from_lines(csv_path, entry, lines)
+
+        for start in range(0, len(rows), tail_cfg.batch_size):
+            batch = rows[start:start + tail_cfg.batch_size]
+            for collection, group in _group_by_collection(batch).items():
+                upsert_docs(
+                    collection,
+                    ids=[doc_id for doc_id, _ in group],
+                    docs=[record for _, record in group],
+                )
+
+        entry.offset = new_offset
+        save_state(state)
+
+        lag = max(0.0, time.time() - st.st_mtime)
+        stats.rows += len(rows)
+        stats.files += 1 if rows else 0
+        stats.max_lag_s = max(stats.max_lag_s, lag)
+        stats.backlog_bytes += st.st_size - new_offset
+
+        if rows:
+            print(f"[TAIL] {csv_path.name}: +{len(rows)} rows, "
+                  f"lag={lag:.2f}s, offset={new_offset}, backlog={st.st_size - new_offset} B")
+
+    return stats
+
+
+def run_tail(
+    poll_interval: Optional[float] = None,
+    from_start: bool = False,
+    once: bool = False,
+):
+    """
+    Poll logs_dir forever (or once), ingesting appended telemetry rows.
+    """
+    if poll_interval is None:
+        poll_interval = tail_cfg.poll_interval
+
+    state = load_state()
+    _sync_with_build(state)
+    # with saved state (ours or the last build's), a file we have not seen
+    # was created while we were down or after the build: read it whole
+    from_start = from_start or bool(state)
+    print(f"[INFO] Watching {paths.logs_dir} every {poll_interval:.1f}s "
+          f"({len(state)} file(s) in saved state)")
+
+    while True:
+        t0 = time.perf_counter()
+        try:
+            _sync_with_build(state)
+            stats = poll_once(state, from_start=from_start)
+        except Exception as e:
+            print(f"[ERROR] Tail poll failed: {e}")
+            stats = None
+
+        if stats is not None and stats.rows:
+            elapsed = time.perf_counter() - t0
+            print(f"[INFO] Poll ingested {stats.rows} rows from {stats.files} file(s) "
+                  f"in {elapsed:.2f}s, max lag {stats.max_lag_s:.2f}s, "
+                  f"backlog {stats.backlog_bytes} B")
+
+        if once:
+            return stats
+
+        # files created after the first scan are new flights: read them whole
+        from_start = True
+
+        # catching up on a large backlog: poll again straight away
+        if stats is None or stats.backlog_bytes == 0:
+            time.sleep(poll_interval)
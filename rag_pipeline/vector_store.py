@@ -1,9 +1,19 @@
+import json
+import os
+import threading
+import time
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
 
-from .config import paths
+from . import metrics
+from .config import paths, vector_store_cfg, hnsw_cfg
 from .embeddings import embed_texts
+from .sharding import shard_collection_name, shard_parent
+
+# Physical collections are named "<name>__<build_id>"; the alias file maps
+# each logical name (e.g. "manual_chunks") to the live version.
+VERSION_SEP = "__"
 
 # Persistent database
 _client = chromadb.PersistentClient(
@@ -12,42 +22,193 @@ _client = chromadb.PersistentClient(
 )
 
 
+# -----------------------------------------------------------
+# Aliases (blue/green versions)
+# -----------------------------------------------------------
+
+_alias_cache: Dict[str, Any] = {"mtime": None, "aliases": {}}
+
+
+def _read_aliases() -> Dict[str, str]:
+    """
+    Returns {logical_name: physical_name}. Re-reads the alias file only when
+    its mtime changes, so query processes see swaps without a restart.
+    """
+    try:
+        mtime = os.stat(paths.alias_file).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+
+    if mtime != _alias_cache["mtime"]:
+        try:
+            aliases = json.loads(paths.alias_file.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"[WARN] Cannot read alias file {paths.alias_file}: {e}")
+            return _alias_cache["aliases"]
+        _alias_cache["mtime"] = mtime
+        _alias_cache["aliases"] = aliases
+
+    return _alias_cache["aliases"]
+
+
+def _write_aliases(aliases: Dict[str, str]):
+    """
+    Atomic replace: readers see either the old or the new file, never a partial one.
+    """
+    paths.alias_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = paths.alias_file.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps(aliases, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, paths.alias_file)
+
+
+def resolve_collection_name(name: str) -> str:
+    """
+    Logical name -> live physical collection. Unaliased names resolve to
+    themselves (indexes built before versioning keep working).
+    """
+    return _read_aliases().get(name, name)
+
+
+def swap_alias(name: str, physical_name: str):
+    aliases = dict(_read_aliases())
+    previous = aliases.get(name)
+    aliases[name] = physical_name
+    _write_aliases(aliases)
+    print(f"[INFO] Alias '{name}': {previous or name} → {physical_name}")
+
+
+def new_build_id() -> str:
+    return time.strftime("%Y%m%dT%H%M%S")
+
+
+def _list_collection_names() -> List[str]:
+    # chromadb < 0.6 returns Collection objects, >= 0.6 returns names
+    return [getattr(c, "name", c) for c in _client.list_collections()]
+
+
+def list_versions(name: str) -> List[str]:
+    """
+    All physical versions of a logical collection, oldest first. A legacy
+    unversioned collection with the bare name counts as the oldest.
+    """
+    prefix = name + VERSION_SEP
+    versions = sorted(n for n in _list_collection_names() if n.startswith(prefix))
+    if name in _list_collection_names():
+        versions.insert(0, name)
+    return versions
+
+
+def gc_versions(name: str, keep: Optional[int] = None):
+    """
+    Drops old versions of `name`, keeping the live one plus the `keep`
+    most recent previous builds (for in-flight queries and rollback).
+    """
+    if keep is None:
+        keep = vector_store_cfg.keep_versions
+
+    live = resolve_collection_name(name)
+    previous = [v for v in list_versions(name) if v != live]
+    stale = previous[:-keep] if keep > 0 else previous
+
+    for version in stale:
+        try:
+            _client.delete_collection(version)
+            print(f"[INFO] Garbage-collected old collection '{version}'.")
+        except Exception as e:
+            print(f"[WARN] Could not delete old collection '{version}': {e}")
+
+
+def hnsw_metadata(name: str) -> Dict[str, Any]:
+    """
+    Collection metadata carrying the HNSW parameters for logical collection
+    `name`: hnsw_cfg defaults with hnsw_cfg.overrides[name] applied. Shards
+    inherit the overrides of their parent ("telemetry_records-ac-12-…"
+    uses overrides["telemetry_records"]), then their own.
+    """
+    params = {
+        "space": hnsw_cfg.space,
+        "M": hnsw_cfg.M,
+        "construction_ef": hnsw_cfg.construction_ef,
+        "search_ef": hnsw_cfg.search_ef,
+    }
+    parent = shard_parent(name, hnsw_cfg.overrides)
+    if parent is not None:
+        params.update(hnsw_cfg.overrides[parent])
+    params.update(hnsw_cfg.overrides.get(name, {}))
+    return {f"hnsw:{k}": v for k, v in params.items()}
+
+
 def get_or_create_collection(name: str):
+    logical = name
+    name = resolve_collection_name(name)
     try:
         return _client.get_collection(name=name)
     except Exception:
         return _client.create_collection(
             name=name,
-            metadata={"hnsw:space": "cosine"}
+            metadata=hnsw_metadata(logical)
+        )
+
+
+def _validate_collection(collection, expected_count: int, probe_embedding: List[float]):
+    count = collection.count()
+    if count != expected_count:
+        raise RuntimeError(
+            f"collection '{collection.name}' has {count} items, expected {expected_count}"
         )
 
+    res = collection.query(query_embeddings=[probe_embedding], n_results=1)
+    if not res or not res.get("ids") or not res["ids"][0]:
+        raise RuntimeError(f"probe query on '{collection.name}' returned no results")
+
+
+def _unused_version_name(name: str, build_id: str) -> str:
+    """
+    "<name>__<build_id>", suffixed "-2", "-3", ... if that version already
+    exists (same-second builds, reused build ids). Existing versions are
+    never overwritten: one of them may be live or kept for rollback.
+    """
+    existing = set(list_versions(name))
+    version_name = f"{name}{VERSION_SEP}{build_id}"
+    suffix = 1
+    while version_name in existing:
+        suffix += 1
+        version_name = f"{name}{VERSION_SEP}{build_id}-{suffix}"
+    return version_name
+
 
 def build_collection(
     name: str,
     docs: List[Dict[str, Any]],
     prefix: str,
-    batch_size: int = 256
+    batch_size: int = 256,
+    build_id: Optional[str] = None,
 ):
     """
     Build (or rebuild) a Chroma collection from a list of docs:
         docs: [{"text": "...", "metadata": {...}}, ...]
+
+    Blue/green: the build goes into a new "<name>__<build_id>" collection
+    while the current version keeps serving. Once it validates, the alias
+    is swapped atomically and old versions are garbage-collected.
     """
+    if build_id is None:
+        build_id = new_build_id()
 
-    # Always delete old collection before indexing
-    try:
-        _client.delete_collection(name)
-        print(f"[INFO] Removed existing collection '{name}' before rebuild.")
-    except Exception:
-        print(f"[INFO] No previous collection '{name}' found. Creating new one.")
+    if not docs:
+        print(f"[WARN] No docs passed to build_collection('{name}'). Keeping current version.")
+        return None
+
+    version_name = _unused_version_name(name, build_id)
 
+    metadata = hnsw_metadata(name)
     collection = _client.create_collection(
-        name=name,
-        metadata={"hnsw:space": "cosine"}
+        name=version_name,
+        metadata=metadata
     )
-
-    if not docs:
-        print(f"[WARN] No docs passed to build_collection('{name}'). Skipping.")
-        return collection
+    print(f"[INFO] Building '{name}' into new version '{version_name}' "
+          f"(M={metadata['hnsw:M']}, construction_ef={metadata['hnsw:construction_ef']}, "
+          f"search_ef={metadata['hnsw:search_ef']}).")
 
     ids = [f"{prefix}_{i}" for i in range(len(docs))]
     texts = [d.get("text", "") for d in docs]
@@ -67,6 +228,8 @@ def build_collection(
     print(f"[INFO] Total non-empty docs to embed for '{name}': {len(filtered_texts)}")
     print(f"[INFO] Embedding in batches of {batch_size}")
 
+    probe_embedding = None
+
     for start in range(0, len(filtered_texts), batch_size):
         end = start + batch_size
         batch_ids = filtered_ids[start:end]
@@ -86,6 +249,9 @@ def build_collection(
         except AttributeError:
             pass
 
+        if probe_embedding is None:
+            probe_embedding = batch_embeddings[0]
+
         # ensure metadata are dicts
         batch_metadatas = [
             m if isinstance(m, dict) and m else {"source": "unknown"}
@@ -99,13 +265,210 @@ def build_collection(
             embeddings=batch_embeddings,
         )
 
+    try:
+        if probe_embedding is None:
+            raise RuntimeError("no non-empty docs were embedded")
+        _validate_collection(collection, len(filtered_ids), probe_embedding)
+    except Exception as e:
+        print(f"[ERROR] Validation failed for '{version_name}': {e}. "
+              f"'{name}' stays on {resolve_collection_name(name)}.")
+        _client.delete_collection(version_name)
+        raise
+
+    swap_alias(name, version_name)
+    gc_versions(name)
+
     print(f"[SUCCESS] Collection '{name}' built with {collection.count()} items.")
     return collection
 
 
+# -----------------------------------------------------------
+# Shards (per-aircraft / per-family collections)
+# -----------------------------------------------------------
+
+# {logical_name: {shard_key: {"collection": shard logical name, "count": n}}}
+_shard_cache: Dict[str, Any] = {"mtime": None, "shards": {}, "metrics_gen": None}
+
+
+def _read_shards() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    try:
+        mtime = os.stat(paths.shard_registry_file).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+
+    if mtime != _shard_cache["mtime"]:
+        try:
+            shards = json.loads(paths.shard_registry_file.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"[WARN] Cannot read shard registry {paths.shard_registry_file}: {e}")
+            return _shard_cache["shards"]
+        _shard_cache["mtime"] = mtime
+        _shard_cache["shards"] = shards
+        _shard_cache["metrics_gen"] = None
+
+    # re-publish after a metrics.reset() too, not only when the file changes
+    if _shard_cache["metrics_gen"] != metrics.generation():
+        _shard_cache["metrics_gen"] = metrics.generation()
+        for entries in _shard_cache["shards"].values():
+            for entry in entries.values():
+                metrics.set_gauge(f"shard.size.{entry['collection']}", entry.get("count", 0))
+
+    return _shard_cache["shards"]
+
+
+def _write_shards(shards: Dict[str, Dict[str, Dict[str, Any]]]):
+    paths.shard_registry_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = paths.shard_registry_file.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps(shards, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, paths.shard_registry_file)
+
+
+def get_shards(name: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Shards of logical collection `name` ({} if it is not sharded).
+    An attached bundle's shard map takes precedence over the local registry.
+    """
+    bundle = _get_bundle()
+    if bundle is not None and name in bundle.manifest.get("shards", {}):
+        return bundle.manifest["shards"][name]
+    return _read_shards().get(name, {})
+
+
+def set_shards(name: str, entries: Dict[str, Dict[str, Any]]):
+    shards = dict(_read_shards())
+    if entries:
+        shards[name] = entries
+    else:
+        shards.pop(name, None)
+    _write_shards(shards)
+
+
+def register_shard(name: str, key: str) -> str:
+    """
+    Returns the shard collection for `key`, registering it if new
+    (used by incremental ingestion when a new aircraft shows up).
+    """
+    entries = dict(get_shards(name))
+    if key not in entries:
+        entries[key] = {"collection": shard_collection_name(name, key), "count": 0}
+        set_shards(name, entries)
+        print(f"[INFO] Registered new shard '{entries[key]['collection']}' for {name}[{key}]")
+    return entries[key]["collection"]
+
+
+def drop_collection(name: str):
+    """
+    Deletes every version of logical collection `name` and its alias.
+    """
+    for version in list_versions(name):
+        try:
+            _client.delete_collection(version)
+        except Exception as e:
+            print(f"[WARN] Could not delete collection '{version}': {e}")
+
+    aliases = dict(_read_aliases())
+    if aliases.pop(name, None) is not None:
+        _write_aliases(aliases)
+
+
+def build_sharded_collection(
+    name: str,
+    docs: List[Dict[str, Any]],
+    prefix: str,
+    shard_key: Callable[[Dict[str, Any]], str],
+    batch_size: int = 256,
+    build_id: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Splits docs by shard_key(metadata) and builds one blue/green collection
+    per shard, then publishes the shard map. Shards that no longer have any
+    docs, and the unsharded collection itself, are dropped.
+    """
+    if build_id is None:
+        build_id = new_build_id()
+
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for d in docs:
+        groups.setdefault(shard_key(d.get("metadata") or {}), []).append(d)
+
+    print(f"[INFO] Sharding '{name}' into {len(groups)} shard(s): "
+          + ", ".join(f"{k}={len(v)}" for k, v in sorted(groups.items())))
+
+    names = {key: shard_collection_name(name, key) for key in groups}
+    if len(set(names.values())) != len(names):
+        clash = sorted(k for k in names if list(names.values()).count(names[k]) > 1)
+        raise ValueError(f"Shard keys {clash} of '{name}' map to the same collection name")
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    for key, group in sorted(groups.items()):
+        shard_name = names[key]
+        collection = build_collection(
+            shard_name, group, prefix=f"{prefix}_{shard_name[len(name) + 1:]}",
+            batch_size=batch_size, build_id=build_id,
+        )
+        entries[key] = {"collection": shard_name, "count": collection.count() if collection else 0}
+        metrics.set_gauge(f"shard.size.{shard_name}", entries[key]["count"])
+
+    live = {e["collection"] for e in entries.values()}
+    stale = {e["collection"] for e in get_shards(name).values()} - live
+    set_shards(name, entries)
+
+    for shard_name in stale:
+        print(f"[INFO] Dropping shard '{shard_name}' (no docs in this build).")
+        drop_collection(shard_name)
+    drop_collection(name)
+
+    return entries
+
+
+def unshard(name: str):
+    """
+    Drops all shards of `name` (after an unsharded rebuild took over).
+    """
+    entries = get_shards(name)
+    if not entries:
+        return
+    set_shards(name, {})
+    for entry in entries.values():
+        drop_collection(entry["collection"])
+    print(f"[INFO] Removed {len(entries)} shard(s) of '{name}'.")
+
+
+def upsert_docs(name: str, ids: List[str], docs: List[Dict[str, Any]]):
+    """
+    Embed and upsert docs into the live version of a logical collection.
+    Used for incremental ingestion; ids must be stable so retries are idempotent.
+    """
+    if not ids:
+        return
+
+    collection = get_or_create_collection(name)
+
+    texts = [d.get("text", "") for d in docs]
+    metadatas = [
+        d.get("metadata") if isinstance(d.get("metadata"), dict) and d.get("metadata") else {"source": "unknown"}
+        for d in docs
+    ]
+
+    embeddings = embed_texts(texts)
+    try:
+        embeddings = embeddings.tolist()
+    except AttributeError:
+        pass
+
+    collection.upsert(
+        ids=ids,
+        documents=texts,
+        metadatas=metadatas,
+        embeddings=embeddings,
+    )
+
+
 def query_collection(name: str, query: str, n_results: int = 5):
     """
     Query a Chroma collection using text similarity.
+    `name` is a logical name; it is resolved through the alias file
+    on every call so a swapped-in build is picked up immediately.
     Returns:
         {
             "ids": [...],
@@ -114,18 +477,64 @@ def query_collection(name: str, query: str, n_results: int = 5):
             "distances": [...]
         }
     """
+    query_emb = embed_texts([query])[0]  # numpy vector
+    return query_collection_batch(name, [query_emb], n_results)
+
+
+# -----------------------------------------------------------
+# Serving from a prebuilt bundle (see index_bundle.py)
+# -----------------------------------------------------------
+
+_bundle = None
+_bundle_lock = threading.Lock()
+
+
+def attach_bundle(bundle):
+    """
+    Serve queries for the bundle's collections from its memory-mapped
+    vectors instead of Chroma. Pass None to detach.
+    """
+    global _bundle
+    _bundle = bundle
+
+
+def _get_bundle():
+    global _bundle
+    if _bundle is None and vector_store_cfg.serve_from_bundle:
+        # retrieval threads race here on the first request; load only once
+        with _bundle_lock:
+            if _bundle is None:
+                from .index_bundle import load_bundle
+                _bundle = load_bundle(paths.index_bundle)
+    return _bundle
+
+
+def query_collection_batch(name: str, query_embeddings, n_results: int = 5):
+    """
+    Query a Chroma collection with several pre-computed embeddings in one call.
+    Result lists have one row per query embedding, in input order.
+    """
+    bundle = _get_bundle()
+    if bundle is not None and name in bundle.collections:
+        return bundle.query(name, query_embeddings, n_results)
+
+    name = resolve_collection_name(name)
     try:
         collection = _client.get_collection(name=name)
     except Exception as e:
         print(f"[ERROR] Cannot load collection '{name}': {e}")
         return None
 
-    from .embeddings import embed_texts
-    query_emb = embed_texts([query])[0]  # numpy vector
+    try:
+        query_embeddings = query_embeddings.tolist()
+    except AttributeError:
+        query_embeddings = [
+            q.tolist() if hasattr(q, "tolist") else q for q in query_embeddings
+        ]
 
     try:
         results = collection.query(
-            query_embeddings=[query_emb.tolist()],
+            query_embeddings=query_embeddings,
             n_results=n_results,
         )
         return results
@@ -1,49 +1,121 @@
-from rag_pipeline.data_ingestion import load_manual_pdfs, load_telemetry_files
+import argparse
+
+from rag_pipeline.config import ingestion_cfg, embedding_cfg, sharding_cfg
+from rag_pipeline.data_ingestion import load_manual_pdfs, load_telemetry_files, log_read_offsets, save_read_offsets
 from rag_pipeline.chunking import chunk_text
-from rag_pipeline.vector_store import build_collection
+from rag_pipeline.telemetry_store import build_telemetry_store
+from rag_pipeline.embeddings import start_embedding_pool, stop_embedding_pool, embedding_pool_workers
+from rag_pipeline.sharding import manual_shard_key, telemetry_shard_key
+
+
+def main():
+    # Imported here, not at module level: spawned embedding workers re-import
+    # this module, and vector_store opens a PersistentClient on import.
+    from rag_pipeline.vector_store import build_collection, build_sharded_collection, new_build_id, unshard
+
+    parser = argparse.ArgumentParser(description="Build the AeroSense RAG vector index.")
+    parser.add_argument(
+        "--workers", type=int, default=ingestion_cfg.workers,
+        help="ingestion processes (1 = serial, 0 = one per CPU core)",
+    )
+    parser.add_argument(
+        "--embed-workers", type=int, default=embedding_cfg.workers,
+        help="embedding processes, each with its own model copy (0 = one per CPU core)",
+    )
+    parser.add_argument(
+        "--shard-telemetry", action=argparse.BooleanOptionalAction, default=sharding_cfg.shard_telemetry,
+        help="one telemetry collection per aircraft",
+    )
+    parser.add_argument(
+        "--shard-manuals", action=argparse.BooleanOptionalAction, default=sharding_cfg.shard_manuals,
+        help="one manual collection per model family (ShardingConfig.family_by_source)",
+    )
+    parser.add_argument(
+        "--torch-threads", type=int, default=embedding_cfg.torch_threads,
+        help="torch threads per embedding worker (0 = cores // embed-workers)",
+    )
+    args = parser.parse_args()
+
+    print("\n=== BUILDING UAV RAG INDEX ===\n")
+
+    # ------------------------------
+    # 1. Manual ingestion
+    # ------------------------------
+    print("[1] Loading manuals...")
+    manual_docs = load_manual_pdfs(workers=args.workers)
+    manual_chunks = chunk_text(manual_docs)
+
+    for i, c in enumerate(manual_chunks):
+        c["metadata"]["id"] = f"manual_{i}"
+        c["metadata"]["source"] = c["metadata"].get("source", "manual")
+
+    print(f"✔ Manual chunks: {len(manual_chunks)}")
+
 
-print("\n=== BUILDING UAV RAG INDEX ===\n")
+    # ------------------------------
+    # 2. Telemetry ingestion
+    # ------------------------------
+    print("\n[2] Loading telemetry...")
+    # rows appended after this snapshot are left to the tailer, which
+    # resumes from it once this build is live
+    read_offsets = log_read_offsets()
+    telemetry_records = load_telemetry_files(workers=args.workers, offsets=read_offsets)
 
-# ------------------------------
-# 1. Manual ingestion
-# ------------------------------
-print("[1] Loading manuals...")
-manual_docs = load_manual_pdfs()
-manual_chunks = chunk_text(manual_docs)
+    # IMPORTANT — chunk telemetry records for RAG indexing
+    telemetry_chunks = chunk_text(telemetry_records)
 
-for i, c in enumerate(manual_chunks):
-    c["metadata"]["id"] = f"manual_{i}"
-    c["metadata"]["source"] = c["metadata"].get("source", "manual")
+    for i, c in enumerate(telemetry_chunks):
+        c["metadata"]["id"] = f"telemetry_{i}"
+        c["metadata"]["source"] = c["metadata"].get("source", "telemetry")
 
-print(f"✔ Manual chunks: {len(manual_chunks)}")
+    print(f"✔ Telemetry chunks: {len(telemetry_chunks)}")
 
+    # numeric copy of the same logs for threshold / range questions
+    print("\n[2b] Building columnar telemetry store...")
+    build_telemetry_store()
 
-# ------------------------------
-# 2. Telemetry ingestion
-# ------------------------------
-print("\n[2] Loading telemetry...")
-telemetry_records = load_telemetry_files()
 
-# IMPORTANT — chunk telemetry records for RAG indexing
-telemetry_chunks = chunk_text(telemetry_records)
+    # ------------------------------
+    # 3. Build collections
+    # ------------------------------
+    # New versions are built next to the live ones and swapped in atomically,
+    # so a running app keeps serving during the rebuild.
+    build_id = new_build_id()
+    print(f"\n[3] Building Chroma collections (build {build_id})...\n")
 
-for i, c in enumerate(telemetry_chunks):
-    c["metadata"]["id"] = f"telemetry_{i}"
-    c["metadata"]["source"] = c["metadata"].get("source", "telemetry")
+    start_embedding_pool(workers=args.embed_workers, torch_threads=args.torch_threads)
 
-print(f"✔ Telemetry chunks: {len(telemetry_chunks)}")
+    # give every pool worker several batches per add() round
+    batch_size = max(256, embedding_cfg.batch_size * embedding_pool_workers() * 4)
 
+    try:
+        print("➡ Building MANUAL collection...")
+        if args.shard_manuals:
+            build_sharded_collection("manual_chunks", manual_chunks, prefix="manual",
+                                     shard_key=manual_shard_key,
+                                     batch_size=batch_size, build_id=build_id)
+        else:
+            build_collection("manual_chunks", manual_chunks, prefix="manual",
+                             batch_size=batch_size, build_id=build_id)
+            unshard("manual_chunks")
 
-# ------------------------------
-# 3. Build collections
-# ------------------------------
-print("\n[3] Building Chroma collections...\n")
+        print("\n➡ Building TELEMETRY collection...")
+        if args.shard_telemetry:
+            build_sharded_collection("telemetry_records", telemetry_chunks, prefix="telemetry",
+                                     shard_key=telemetry_shard_key,
+                                     batch_size=batch_size, build_id=build_id)
+        else:
+            build_collection("telemetry_records", telemetry_chunks, prefix="telemetry",
+                             batch_size=batch_size, build_id=build_id)
+            unshard("telemetry_records")
+    finally:
+        stop_embedding_pool()
 
-print("➡ Building MANUAL collection...")
-build_collection("manual_chunks", manual_chunks, prefix="manual")
+    save_read_offsets(build_id, read_offsets)
 
-print("\n➡ Building TELEMETRY collection...")
-build_collection("telemetry_records", telemetry_chunks, prefix="telemetry")
+    print("\n🎉 Vector DB built successfully!\n")
 
-print("\n🎉 Vector DB built successfully!\n")
 
+# spawned ingestion / embedding workers re-import this module
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import argparse
+from pathlib import Path
+
+from rag_pipeline.bulk_diagnosis import run_bulk_diagnosis
+
+parser = argparse.ArgumentParser(
+    description="Run diagnoses for a JSONL file of queries ({\"id\": ..., \"query\": ...} per line)."
+)
+parser.add_argument("input", type=Path, help="input JSONL with one query per line")
+parser.add_argument("output", type=Path, help="output JSONL; existing ids are skipped (resume)")
+parser.add_argument("--batch-size", type=int, default=32, help="queries per retrieval batch")
+parser.add_argument("--concurrency", type=int, default=4, help="parallel LLM generations")
+parser.add_argument("--temperature", type=float, default=0.2)
+args = parser.parse_args()
+
+print("\n=== AEROSENSE BULK DIAGNOSIS ===\n")
+
+run_bulk_diagnosis(
+    args.input,
+    args.output,
+    batch_size=args.batch_size,
+    concurrency=args.concurrency,
+    temperature=args.temperature,
+)
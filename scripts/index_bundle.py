@@ -0,0 +1,36 @@
+import argparse
+from pathlib import Path
+
+from rag_pipeline.config import paths
+from rag_pipeline.index_bundle import DEFAULT_COLLECTIONS, export_bundle, import_bundle, load_bundle
+from rag_pipeline.vector_store import attach_bundle
+from rag_pipeline.retrieval import retrieve_uav_docs
+
+parser = argparse.ArgumentParser(description="Export / import a portable prebuilt index bundle.")
+sub = parser.add_subparsers(dest="command", required=True)
+
+p_export = sub.add_parser("export", help="write the live collections to a bundle file")
+p_export.add_argument("path", type=Path, nargs="?", default=paths.index_bundle)
+p_export.add_argument("--collections", nargs="+", default=list(DEFAULT_COLLECTIONS))
+
+p_import = sub.add_parser("import", help="load a bundle into local Chroma and swap aliases")
+p_import.add_argument("path", type=Path, nargs="?", default=paths.index_bundle)
+
+p_check = sub.add_parser("check", help="map a bundle, verify the model, warm up and run a query")
+p_check.add_argument("path", type=Path, nargs="?", default=paths.index_bundle)
+p_check.add_argument("--query", default="ESC overheating during climb")
+p_check.add_argument("--no-prefetch", action="store_true")
+
+args = parser.parse_args()
+
+if args.command == "export":
+    export_bundle(args.path, collections=args.collections)
+
+elif args.command == "import":
+    import_bundle(args.path)
+
+elif args.command == "check":
+    bundle = load_bundle(args.path, prefetch=not args.no_prefetch)
+    attach_bundle(bundle)
+    for i, doc in enumerate(retrieve_uav_docs(args.query), start=1):
+        print(f"#{i} [{doc.source_type}] score={doc.score:.3f} source={doc.metadata.get('source', '')}")
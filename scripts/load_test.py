@@ -0,0 +1,96 @@
+import argparse
+import json
+from pathlib import Path
+
+from rag_pipeline.config import models
+from rag_pipeline.fake_ollama import FakeOllamaServer
+from rag_pipeline.load_test import run_load_test
+
+DEFAULT_QUERIES = [
+    "ESC overheating during high-altitude climb",
+    "IMU vibration spikes at 40–60s mark",
+    "GPS dropout after aggressive yaw maneuver",
+    "Motor desync causing RPM imbalance",
+    "Voltage sag under high throttle load",
+]
+
+
+def _floats(text):
+    return [float(x) for x in text.split(",") if x.strip()]
+
+
+def _load_queries(path: Path):
+    queries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            line = json.loads(line)["query"]
+        queries.append(line)
+    return queries
+
+
+parser = argparse.ArgumentParser(
+    description="Load-test retrieval + generation and find the saturation point."
+)
+parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                    help="closed: levels are concurrent users; open: levels are arrival rates (req/s)")
+parser.add_argument("--levels", type=_floats, default=[1, 2, 4, 8, 16])
+parser.add_argument("--requests", type=int, default=50, help="requests per level")
+parser.add_argument("--concurrency", type=int, default=8, help="worker threads in open mode")
+parser.add_argument("--queries", type=Path, help="text or JSONL file of queries (default: sample queries)")
+parser.add_argument("--budget", type=float, help="per-request time budget in seconds (Deadline)")
+parser.add_argument("--aircraft", help="scope telemetry retrieval to this aircraft's shard")
+parser.add_argument("--p99-slo", type=float, help="request p99 (s) above which a level counts as saturated")
+parser.add_argument("--min-gain", type=float, default=0.10,
+                    help="throughput gain below which adding load counts as saturation")
+parser.add_argument("--real-ollama", action="store_true",
+                    help=f"use the Ollama server at models.ollama_url ({models.ollama_url}) instead of the stand-in")
+parser.add_argument("--token-latency", type=float, default=0.02, help="stand-in: seconds per generated token")
+parser.add_argument("--prompt-latency", type=float, default=0.01, help="stand-in: seconds per 1k prompt chars")
+parser.add_argument("--response-tokens", type=int, default=128, help="stand-in: tokens per answer")
+parser.add_argument("--parallel", type=int, default=1, help="stand-in: concurrent generations (OLLAMA_NUM_PARALLEL)")
+parser.add_argument("--json", help="also write the full report to this file")
+args = parser.parse_args()
+
+queries = _load_queries(args.queries) if args.queries else DEFAULT_QUERIES
+
+print("\n=== AEROSENSE LOAD TEST ===\n")
+
+server = None
+if not args.real_ollama:
+    server = FakeOllamaServer(
+        token_latency_s=args.token_latency,
+        prompt_latency_s_per_kchar=args.prompt_latency,
+        response_tokens=args.response_tokens,
+        parallel=args.parallel,
+    ).start()
+    models.ollama_url = server.url
+    print(f"[INFO] Ollama stand-in at {server.url}: {args.token_latency * 1000:.0f} ms/token, "
+          f"{args.response_tokens} tokens/answer, {args.parallel} parallel slot(s)")
+
+print(f"[INFO] {args.mode} loop, levels={args.levels}, {args.requests} requests per level "
+      f"(latencies shown as p50/p95/p99)\n")
+
+try:
+    report = run_load_test(
+        queries,
+        levels=args.levels,
+        mode=args.mode,
+        requests_per_level=args.requests,
+        concurrency=args.concurrency,
+        budget_s=args.budget,
+        aircraft=args.aircraft,
+        min_gain=args.min_gain,
+        p99_slo_s=args.p99_slo,
+        backend=server,
+    )
+finally:
+    if server is not None:
+        server.stop()
+
+if args.json:
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Report written to {args.json}")
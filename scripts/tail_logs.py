@@ -0,0 +1,28 @@
+import argparse
+
+from rag_pipeline.config import tail_cfg
+from rag_pipeline.telemetry_tail import run_tail
+
+parser = argparse.ArgumentParser(
+    description="Watch data/logs/ and make newly appended telemetry rows searchable."
+)
+parser.add_argument(
+    "--interval", type=float, default=tail_cfg.poll_interval,
+    help="seconds between polls",
+)
+parser.add_argument(
+    "--from-start", action="store_true",
+    help="on the first run (no saved state), ingest existing files from byte 0 instead of their current end",
+)
+parser.add_argument(
+    "--once", action="store_true",
+    help="run a single poll and exit",
+)
+args = parser.parse_args()
+
+print("\n=== AEROSENSE TELEMETRY TAIL ===\n")
+
+try:
+    run_tail(poll_interval=args.interval, from_start=args.from_start, once=args.once)
+except KeyboardInterrupt:
+    print("\n[INFO] Tail stopped.")
@@ -0,0 +1,57 @@
+import argparse
+import json
+
+from rag_pipeline.hnsw_tuning import tune_hnsw, recommend, results_as_dicts
+
+
+def _ints(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+parser = argparse.ArgumentParser(
+    description="Measure recall@k / latency / memory of HNSW settings on a sample of a collection."
+)
+parser.add_argument("collection", nargs="?", default="telemetry_records")
+parser.add_argument("--sample", type=int, default=5000, help="base vectors to index per candidate")
+parser.add_argument("--queries", type=int, default=200, help="held-out query vectors")
+parser.add_argument("--k", type=int, default=10)
+parser.add_argument("--recall-target", type=float, default=0.95)
+parser.add_argument("--M", type=_ints, default=[8, 16, 32, 48])
+parser.add_argument("--construction-ef", type=_ints, default=[64, 100, 200])
+parser.add_argument("--search-ef", type=_ints, default=[10, 32, 64, 128])
+parser.add_argument("--json", help="also write all results to this file")
+args = parser.parse_args()
+
+print("\n=== HNSW TUNING ===\n")
+
+results = tune_hnsw(
+    args.collection,
+    sample_size=args.sample,
+    num_queries=args.queries,
+    k=args.k,
+    Ms=args.M,
+    construction_efs=args.construction_ef,
+    search_efs=args.search_ef,
+)
+
+if args.json:
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(results_as_dicts(results), f, indent=2)
+
+best = recommend(results, args.recall_target)
+
+print("\n=== Recommendation ===")
+if best is None:
+    top = max(results, key=lambda r: r.recall)
+    print(f"No setting reached recall {args.recall_target:.2f} "
+          f"(best: {top.recall:.3f} with M={top.M}, construction_ef={top.construction_ef}, "
+          f"search_ef={top.search_ef}). Widen the grid.")
+else:
+    rss = f"{best.rss_delta_mb:.1f}MB" if best.rss_delta_mb is not None else "n/a"
+    print(f"M={best.M}, construction_ef={best.construction_ef}, search_ef={best.search_ef}")
+    print(f"recall@{args.k}={best.recall:.3f}  p50={best.p50_ms:.2f}ms  p99={best.p99_ms:.2f}ms  "
+          f"index≈{best.est_index_mb:.1f}MB (RSS +{rss})")
+    print("\nAdd to HnswConfig.overrides in rag_pipeline/config.py:")
+    print(f'    "{args.collection}": {{"M": {best.M}, "construction_ef": {best.construction_ef}, '
+          f'"search_ef": {best.search_ef}}}')
+    print("then rebuild the index.")